@@ -8,64 +8,272 @@
 #
 #   An assember for the Red Pitaya.
 # 	Generates machine code from code written in the assembly language.
-# 	Outputs two files, out_bin.txt, which contains the commands in binary,
-# 	and out_hex.txt, which contains the commands in hex.
+# 	Assembly is done in memory, a listing <name>_hex.txt with the commands
+# 	in hex is only written on request (assemble(..., listing = True)).
 # 	See sample usage at the bottom (commented out).
 # 	Comments must be prefaced by //
 # 	Variables must come first
 # 	Numerical values of variables must be in base 16 (hexadecimal)
+# 	PR delays may be named timing slots, e.g. PR 3, {TE/2-112}, that are
+# 	set in us when the assembled template is patched
 #
 ################################################################################
 
-import pdb # Debugging
+import ast
 import numpy as np
 import math
+import operator
 import logging # For errors
-import struct
+import hashlib
+import json
+import os
+import re
+from collections import OrderedDict
+
+# Bump whenever the generated machine code changes, invalidates cached programs
+ASSEMBLER_VERSION = '1.2'
+CACHE_DIR = 'sequence/.cache'
+
+logger = logging.getLogger(__name__)
+
+# PR delays are given in us, the delay constant counts 7ns clock cycles
+conversion_factor = 1/(7e-3)
+DELAY_BITS = 40
+DELAY_MASK = (1 << DELAY_BITS) - 1
+
+# Timing slot in the delay field of PR, e.g. PR 3, {TE/2-112}
+slot_pattern = re.compile(r'\{([^{}]*)\}')
+slot_operators = {ast.Add: operator.add, ast.Sub: operator.sub, ast.Mult: operator.mul, ast.Div: operator.truediv,
+	ast.UAdd: operator.pos, ast.USub: operator.neg}
+
+
+def slot_number(node):
+	''' Value of a numeric literal or None, Python 3.7 parses numbers as ast.Num, later versions as ast.Constant '''
+	value = node.n if type(node).__name__ == 'Num' else node.value if isinstance(node, ast.Constant) else None
+	return value if type(value) in (int, float) else None
+
+
+def parse_slot(expression):
+	''' Parses a timing slot, only parameter names, numbers and + - * / are allowed '''
+	try:
+		tree = ast.parse(expression.strip(), mode = 'eval').body
+	except SyntaxError:
+		tree = None
+	for node in ast.walk(tree) if tree is not None else [None]:
+		if isinstance(node, (ast.BinOp, ast.UnaryOp)) and type(node.op) in slot_operators:
+			continue
+		if isinstance(node, ast.Name) and isinstance(node.ctx, ast.Load):
+			continue
+		if slot_number(node) is not None:
+			continue
+		if isinstance(node, (ast.operator, ast.unaryop, ast.expr_context)):
+			continue
+		raise ValueError("Invalid timing slot {{{}}}".format(expression))
+	return tree
+
+
+def eval_slot(node, parameters):
+	''' Evaluates a parsed timing slot, parameters may be scalars or arrays '''
+	if isinstance(node, ast.Name):
+		return parameters[node.id]
+	if isinstance(node, ast.UnaryOp):
+		return slot_operators[type(node.op)](eval_slot(node.operand, parameters))
+	if isinstance(node, ast.BinOp):
+		return slot_operators[type(node.op)](eval_slot(node.left, parameters), eval_slot(node.right, parameters))
+	return slot_number(node)
+
+
+def delay_cycles(delay):
+	''' Converts a delay in us to the number of clock cycles, rounded down '''
+	return math.floor(int(delay) * conversion_factor)
+
+
+class SequenceTemplate:
+	''' Assembled program with named timing slots. The words of the program are
+	assembled once, setting a slot only patches the delay constant of the
+	recorded words. '''
+	def __init__(self, words, slots = ()):
+		self.words = np.asarray(words, dtype = '<u8')
+		self.slots = [(int(index), expression) for index, expression in slots]
+		self._code = []
+		for index, expression in self.slots:
+			try:
+				self._code.append((index, parse_slot(expression)))
+			except ValueError as error:
+				raise ValueError("{} in word {}".format(error, index)) from None
+		self.image = self.words.tobytes()
+
+	@property
+	def parameters(self):
+		''' Names of the parameters used by the timing slots '''
+		return sorted({node.id for _, code in self._code for node in ast.walk(code) if isinstance(node, ast.Name)})
+
+	def delays(self, parameters = None):
+		''' Evaluates the timing slots, returns the delays in us per slot '''
+		parameters = parameters or {}
+		missing = [name for name in self.parameters if name not in parameters]
+		if missing:
+			raise ValueError("Missing value for timing slot {}".format(', '.join(missing)))
+		return [eval_slot(code, parameters) for _, code in self._code]
+
+	def patch(self, parameters = None):
+		''' Returns the byte image with the timing slots set to the given parameters '''
+		if not self.slots:
+			return self.image
+		words = self.words.copy()
+		for (index, _), delay in zip(self._code, self.delays(parameters)):
+			cycles = delay_cycles(delay)
+			if cycles < 0 or cycles > DELAY_MASK:
+				raise ValueError("Delay {} us of word {} out of range".format(delay, index))
+			words[index] = int(words[index]) & ~DELAY_MASK | cycles
+		return words.tobytes()
+
+	def patch_batch(self, parameters):
+		''' Returns the programs for a sweep of parameters as (n_variants, n_words)
+		uint32 array. Parameters are scalars or vectors of equal length. '''
+		names = [name for name in self.parameters if name in parameters]
+		values = np.broadcast_arrays(*[np.atleast_1d(np.asarray(parameters[name], dtype = float)) for name in names])
+		if any(value.ndim != 1 for value in values):
+			raise ValueError("Parameter sweeps must be one dimensional")
+		n_variants = len(values[0]) if values else 1
+
+		words = np.tile(self.words, (n_variants, 1))
+		keep = np.uint64(~DELAY_MASK & 0xffffffffffffffff)
+		for (index, _), delay in zip(self.slots, self.delays(dict(zip(names, values)))):
+			# Same rounding as delay_cycles, truncate to us and round the cycles down
+			cycles = np.floor(np.trunc(np.broadcast_to(delay, (n_variants,))) * conversion_factor)
+			if np.any(cycles < 0) or np.any(cycles > DELAY_MASK):
+				raise ValueError("Delay of word {} out of range".format(index))
+			words[:, index] = words[:, index] & keep | cycles.astype('<u8')
+		return words.view('<u4')
+
+	def save(self, out_file):
+		''' Writes the template to a binary file object '''
+		np.savez(out_file, words = self.words, slots = np.array(json.dumps(self.slots)))
+
+	@classmethod
+	def load(cls, inp_file):
+		''' Reads a template written by save '''
+		with np.load(inp_file, allow_pickle = False) as data:
+			return cls(data['words'], json.loads(str(data['slots'])))
+
+
+
+class SequenceCache:
+	''' LRU cache of sequence templates, keyed by a hash of the source text and
+	the assembler version. Entries are mirrored to a cache directory on disk, so
+	they survive a restart. '''
+	def __init__(self, maxsize = 32, cache_dir = CACHE_DIR):
+		self.maxsize = maxsize
+		self.cache_dir = cache_dir
+		self._entries = OrderedDict()
+
+	@staticmethod
+	def key(text):
+		''' Returns the cache key of a source text '''
+		digest = hashlib.sha1()
+		digest.update(ASSEMBLER_VERSION.encode())
+		digest.update(b'\0')
+		digest.update(text.encode())
+		return digest.hexdigest()
+
+	def _cache_file(self, key):
+		return os.path.join(self.cache_dir, key + '.npz')
+
+	def get(self, key):
+		''' Returns the cached template or None '''
+		if key in self._entries:
+			self._entries.move_to_end(key)
+			return self._entries[key]
+		try:
+			value = SequenceTemplate.load(self._cache_file(key))
+		except (OSError, ValueError, KeyError):
+			return None
+		self._insert(key, value)
+		return value
+
+	def put(self, key, value):
+		''' Stores a template in memory and on disk '''
+		self._insert(key, value)
+		try:
+			os.makedirs(self.cache_dir, exist_ok = True)
+			# Write to a temporary file first, a crash never leaves a truncated entry
+			tmp_file = self._cache_file(key) + '.tmp'
+			with open(tmp_file, 'wb') as cache_file:
+				value.save(cache_file)
+			os.replace(tmp_file, self._cache_file(key))
+		except OSError:
+			logger.warning("Could not write sequence cache {}".format(self.cache_dir))
+
+	def _insert(self, key, value):
+		self._entries[key] = value
+		self._entries.move_to_end(key)
+		while len(self._entries) > self.maxsize:
+			self._entries.popitem(last = False)
+
+	def clear(self):
+		''' Clears the in-memory entries, the disk mirror is kept '''
+		self._entries.clear()
+
+	def __len__(self):
+		return len(self._entries)
+
+	def __contains__(self, key):
+		return key in self._entries
+
+
+# Shared by all assembler instances
+cache = SequenceCache()
+
 
 class Assembler:
 	def __init__(self):
 		self.pc = 0
 
 		opcode_table = {
-			'NOP' : ['000000'],
-			'DEC' : ['000001', 'A'],
-			'INC' : ['000010', 'A'],
-			'LD64' : ['000100', 'A', 'ADDR'],
-			'TXOFFSET' : ['001000', 'B'],
-			'GRADOFFSET' : ['001001', 'B'],
-			'JNZ' : ['010000', 'A', 'ADDR'],
-			'BTR' : ['010100', 'A'],
-			'RET' : ['010101', 'A'],
-			'J' : ['010111', 'A'],
-			'HALT' : ['011001'],
-			'PI' : ['011100', 'A'],
-			'PR' : ['011101', 'B', 'DELAY']
+			'NOP' : [0b000000],
+			'DEC' : [0b000001, 'A'],
+			'INC' : [0b000010, 'A'],
+			'LD64' : [0b000100, 'A', 'ADDR'],
+			'TXOFFSET' : [0b001000, 'B'],
+			'GRADOFFSET' : [0b001001, 'B'],
+			'JNZ' : [0b010000, 'A', 'ADDR'],
+			'BTR' : [0b010100, 'A'],
+			'RET' : [0b010101, 'A'],
+			'J' : [0b010111, 'A'],
+			'HALT' : [0b011001],
+			'PI' : [0b011100, 'A'],
+			'PR' : [0b011101, 'B', 'DELAY']
 		}
 		bit_table = {
-            'TX_PULSE': '0x01',
-            'RX_PULSE': '0x02',
-            'GRAD_PULSE': '0x04',
-			'TX_GATE': '0x10',
-			'RX_GATE': '0x20',
-			#'GRAD_GATE': '0x06'
+			'TX_PULSE': 0x01,
+			'RX_PULSE': 0x02,
+			'GRAD_PULSE': 0x04,
+			'TX_GATE': 0x10,
+			'RX_GATE': 0x20,
+			#'GRAD_GATE': 0x06
 		}
 		self.opcode_table = opcode_table
 		self.bit_table = bit_table
 		self.var_table = {}
 
-		# Logging
-		self.logger = logging.getLogger()
-		logging.basicConfig(filename = 'assembler.log', filemode = 'w', level = logging.DEBUG)
+		# Logging, configured by the application
+		self.logger = logger
 
+	def field(self, value, bits, line):
+		''' Checks that a value fits into an instruction field of the given width '''
+		if value < 0 or value >> bits:
+			self.logger.error("Value {} exceeds {} bits".format(value, bits), stack_info=True)
+			raise ValueError("Value {} exceeds {} bits on line {}".format(value, bits, line))
+		return value
 
 	def var_parser(self,line):
-		''' Parses the variables '''
+		''' Parses the variables, returns the 64 bit word as integer '''
 		line = line.replace(' ','') # Remove spaces
 		equals_index = line.find('=') # Get everything to the right of the equals sign
 		cmd = line[equals_index + 1:len(line)]
 		var_name = line[0:equals_index] # name of variable
-		cmds_bit = []
+		cmd_out = 0
 		cmd_split = cmd.split('|') # Parse bit patterns
 
 		# Loop over words
@@ -73,101 +281,76 @@ class Assembler:
 			# Check if the word is hex
 			if any(str.isdigit(c) for c in word):
 				try:
-					var = format(int(word, 16), 'b') # NOTE: value of var must be in base 16
-					cmd_out = var.zfill(64)
-					# Add entry to var_table
-					self.var_table[var_name] = self.pc # Indexed by address of the variable, for LD64
-					self.pc += 1
-					return cmd_out
-
+					cmd_out = int(word, 16) # NOTE: value of var must be in base 16
 				except ValueError:
-					logger.exception("Invalid hexadecimal number {}".format(cmd), stack_info=True)
+					self.logger.exception("Invalid hexadecimal number {}".format(cmd), stack_info=True)
+					raise
+				break # A hex value defines the whole variable
 
 			else: # Must be a bit pattern
-				cmd_byte = self.bit_table.get(word)
+				cmd_bit = self.bit_table.get(word)
 				# If not in the dictionary, it is an invalid command
-				if not cmd_byte:
-					logging.error("Unknown command {}".format(word), stack_info=True)
+				if not cmd_bit:
+					self.logger.error("Unknown command {}".format(word), stack_info=True)
 					raise ValueError("Unknown command {}".format(word))
-				cmd_bit = int(cmd_byte, 16) # Convert to bits
-				cmds_bit.append(cmd_bit)
-
-		np_bits = np.array(cmds_bit) # Make numpy array to make bitwise computation easier
-		cmd_out = format(np.bitwise_or.reduce(np_bits), 'b') # String in binary
-		cmd_out = cmd_out.zfill(64) # Zero pad to make it 64 bits
+				cmd_out |= cmd_bit
 
 		# Add entry to var_table
 		self.var_table[var_name] = self.pc # Indexed by address of the variable, for LD64
 		self.pc += 1
-		return cmd_out
+		return self.field(cmd_out, 64, line)
 
 	def make_cmd(self, line):
-		''' Synthesizes the command in binary '''
+		''' Synthesizes the command, returns the 64 bit word as integer '''
 		line = line.split(' ') # Remove spaces
 		opcode = line[0] # Get the opcode
 
 		# Error checking
 		if opcode not in self.opcode_table.keys():
-			logging.error("Unknown opcode {}".format(opcode), stack_info=True)
+			self.logger.error("Unknown opcode {}".format(opcode), stack_info=True)
 			raise ValueError("Unknown opcode {} on line {}".format(opcode, line))
 
-		opcode_bin = self.opcode_table[opcode][0] # Convert to binary from the dict
+		# Opcode occupies the upper 6 bits
+		cmd = self.opcode_table[opcode][0] << 58
 
 		# Cmds without format A or B - NOP and HALT
 		if len(self.opcode_table[opcode]) < 2:
-			remaining_bits = 64 - len(opcode_bin)
-			cmd = opcode_bin + '0'.zfill(remaining_bits)
+			pass
 
-		# Format A
+		# Format A: opcode | 5 bit register at bit 32 | 32 bit address
 		elif self.opcode_table[opcode][1] == 'A':
-			reg_addr = format(int(line[1], 10), 'b').zfill(5)
-			#print(reg_addr)
 			if opcode == 'LD64' or opcode == 'JNZ': # Reg and addr specified
+				reg_addr = int(line[1], 10)
 				if line[2] in self.var_table.keys():
 					addr = self.var_table[line[2]] # Look up address of variable
-					#print(self.var_table)
-					#print(addr)
-
 				else:
 					try:
 						addr = int(line[2], 16) # Must be in hex
-						#print(addr)
 					except ValueError:
-						logger.exception("Invalid hexadecimal number {}".format(line[2]), stack_info=True)
-
-				dir_addr = format(int(addr), 'b').zfill(32)
+						self.logger.exception("Invalid hexadecimal number {}".format(line[2]), stack_info=True)
+						raise
+				dir_addr = addr
 
 			elif opcode == 'DEC' or opcode == 'INC': # Reg specified
-				dir_addr = '0'.zfill(32)
+				reg_addr = int(line[1], 10)
+				dir_addr = 0
 
 			else: # Addr specified
-				dir_addr = format(int(line[1], 16), 'b').zfill(32)
-				reg_addr = '0'.zfill(5)
+				dir_addr = int(line[1], 16)
+				reg_addr = 0
 
 			# Make the command
-			remaining_bits = 64 - len(opcode_bin) - len(reg_addr) - len(dir_addr) # Remaining bits
-			remainder = '0'.zfill(remaining_bits)
-			cmd = opcode_bin + remainder + reg_addr + dir_addr
+			cmd |= self.field(reg_addr, 5, line) << 32 | self.field(dir_addr, 32, line)
 			self.pc += 1 # Increment pc by 1
 
-		# Format B
+		# Format B: opcode | register at bit 40 | 40 bit constant
 		elif self.opcode_table[opcode][1] == 'B':
 			if opcode == 'PR': # PR
-				conversion_factor = 1/(7e-3) # us to ns, assuming 7ns clock cycle
-				num_cycles = math.floor(int(line[2]) * conversion_factor) # Round down
-				const = format(num_cycles, 'b').zfill(40)
-				reg_addr = format(int(line[1]), 'b')
-				#print(reg_addr)
-				remaining_bits = 64 - len(const) - len(opcode_bin) - len(reg_addr)
-				remainder = '0'.zfill(remaining_bits)
-				cmd = opcode_bin + remainder + reg_addr + const
-				#print(cmd)
+				num_cycles = delay_cycles(line[2]) # Round down
+				reg_addr = int(line[1])
+				cmd |= self.field(reg_addr, 18, line) << 40 | self.field(num_cycles, 40, line)
 			else: # TXOFFSET and GRADOFFSET
-				# const = format(int(line[1], 16), 'b').zfill(40)
-				const = format(int(line[1], 10), 'b').zfill(40)
-				remaining_bits = 64 - len(const) - len(opcode_bin)
-				remainder = '0'.zfill(remaining_bits)
-				cmd = opcode_bin + remainder + const
+				cmd |= self.field(int(line[1], 10), 40, line)
 		return cmd
 
 	def strip_lines(self, line):
@@ -181,101 +364,159 @@ class Assembler:
 		#print(line)
 		return line
 
-	def assemble(self, inp_file):
-		''' Converts an input txt file to binary and outputs a text file '''
+	def encode_line(self, idx, line):
+		''' Encodes one source line into a 64 bit word, a timing slot is recorded in self.slots '''
+		line_stripped = self.strip_lines(line)
+		slot = slot_pattern.search(line_stripped)
+		if slot:
+			if not line_stripped.startswith('PR '):
+				raise ValueError("Timing slots are only allowed as PR delay, line {}".format(idx + 1))
+			self.slots.append((idx, slot.group(1).strip()))
+			line_stripped = slot_pattern.sub('0', line_stripped)
+		# If line contains '=', call the var parser
+		if '=' in line_stripped:
+			return self.var_parser(line_stripped)
+		return self.make_cmd(line_stripped)
+
+	def encode(self, lines):
+		''' Encodes a sequence of source lines into an array of 64 bit words.
+		Timing slots are encoded with a zero delay and recorded in self.slots. '''
+		# Addresses of variables are relative to the program start
+		self.pc = 0
+		self.var_table = {}
+		self.slots = []
+
+		words = [self.encode_line(idx, line) for idx, line in enumerate(lines)]
+		return np.array(words, dtype = '<u8')
+
+	def layout(self, line):
+		''' Returns the variable name of a definition, 'A' for a format A instruction or None.
+		Only these lines advance the pc, which defines the variable addresses. '''
+		line_stripped = slot_pattern.sub('0', self.strip_lines(line))
+		if '=' in line_stripped:
+			return line_stripped.replace(' ', '').split('=')[0]
+		entry = self.opcode_table.get(line_stripped.split(' ')[0], [])
+		return 'A' if len(entry) > 1 and entry[1] == 'A' else None
+
+	def compile(self, text, use_cache = True):
+		''' Assembles a source text into a sequence template '''
+		key = cache.key(text)
+		if use_cache:
+			template = cache.get(key)
+			if template is not None:
+				return template
+
+		template = SequenceTemplate(self.encode(text.splitlines()), self.slots)
+		if use_cache:
+			cache.put(key, template)
+		return template
+
+	def recompile(self, template, old_text, new_text, use_cache = True):
+		''' Assembles new_text by re-encoding only the lines that differ from old_text, the source of template.
+		Falls back to a full compile if lines are inserted or removed or the variable layout changes. '''
+		key = cache.key(new_text)
+		if use_cache:
+			cached = cache.get(key)
+			if cached is not None:
+				return cached
+
+		old_lines = old_text.splitlines()
+		new_lines = new_text.splitlines()
+		if len(old_lines) != len(new_lines) or len(new_lines) != len(template.words) \
+				or any([old != new and self.layout(old) != self.layout(new) for old, new in zip(old_lines, new_lines)]):
+			return self.compile(new_text, use_cache)
+
+		self.pc = 0
+		self.var_table = {}
+		self.slots = []
+		words = np.array(template.words, dtype = '<u8')
+		slots = dict(template.slots)
+		for idx, (old, new) in enumerate(zip(old_lines, new_lines)):
+			if old != new:
+				slots.pop(idx, None)
+				words[idx] = self.encode_line(idx, new)
+				continue
+			# Unchanged lines only advance the pc and the variable table
+			name = self.layout(new)
+			if name is not None and name != 'A':
+				self.var_table[name] = self.pc
+			if name is not None:
+				self.pc += 1
+		slots.update(self.slots)
+
+		template = SequenceTemplate(words, sorted(slots.items()))
+		if use_cache:
+			cache.put(key, template)
+		return template
+
+	def load(self, inp_file, use_cache = True):
+		''' Returns the sequence template of an input txt file '''
+		with open(inp_file) as f:
+			text = f.read()
+		return self.compile(text, use_cache)
+
+	def assemble_text(self, text, parameters = None, use_cache = True):
+		''' Converts source text to the byte image, without listing or per-line logging.
+		Timing slots are set from parameters, a dict of values in us. '''
+		# The server reads the 32 bit halves low half first, which is exactly
+		# the little endian layout of the 64 bit words
+		return self.compile(text, use_cache).patch(parameters)
+
+	def assemble_batch(self, template, parameters):
+		''' Assembles program variants for a sweep of timing slot values in one call.
+		Template is a SequenceTemplate or source text, parameters maps slot names
+		to vectors of values in us. Returns a (n_variants, n_words) uint32 array. '''
+		if not isinstance(template, SequenceTemplate):
+			template = self.compile(template)
+		return template.patch_batch(parameters)
+
+	def listing(self, text, parameters = None):
+		''' Generates the lines of the readable machine code listing '''
+		b = self.assemble_text(text, parameters)
+		hex_cmds = [hex(hex_int) for hex_int in np.frombuffer(b, dtype = '<u4').tolist()]
+		for idx, hex_cmd in enumerate(hex_cmds):
+			# # for generating only machine cmd
+			# if idx%2: # odd idx, even row num
+			# 	yield "pulseq_memory[{}] = {};\n\n".format(idx, hex_cmd)
+			# else: # even idx, odd row num
+			# 	yield "pulseq_memory[{}] = {}; \n".format( idx, hex_cmd)
+
+			# for generating readable machine code
+			if idx%2: # odd idx, even row num
+				yield "\tpulseq_memory[{}] = {}\n\n".format(idx, hex_cmd)
+			else: # even idx, odd row num
+				yield "A[{}]\tpulseq_memory[{}] = {} \n".format( hex(int(idx/2)), idx, hex_cmd)
+
+	def diagnostics(self, text, parameters = None):
+		''' Generates a diagnostic message per source line with the encoded word '''
+		words = np.frombuffer(self.assemble_text(text, parameters), dtype = '<u8').tolist()
+		for idx, (line, cmd) in enumerate(zip(text.splitlines(), words)):
+			yield "Line {0} stripped = {1}, hex cmd = {2}".format(idx + 1, self.strip_lines(line), hex(cmd))
+
+	def assemble(self, inp_file, parameters = None, use_cache = True, listing = False):
+		''' Converts an input txt file to binary. Timing slots are set from parameters,
+		a dict of values in us. With listing, the machine code is written to
+		<name>_hex.txt and the encoded lines are logged. '''
 		# Open the file
-		f = open(inp_file)
-		self.logger.info("Opening file")
-		lines = f.readlines()
-
-    	# Parse the lines
-		cmds = []
-		hex_cmds = []
-		line_ctr = 1
-		for line in lines:
-			line_stripped = self.strip_lines(line)
-			self.logger.info("Line {0} stripped = {1}".format(line_ctr, line_stripped))
-    		# If line contains '=', call the var parser
-			if '=' in line_stripped:
-				cmd = self.var_parser(line_stripped)
-			else:
-				cmd = self.make_cmd(line_stripped)
-
-			# Cut the line in half to convert to byte array, otherwise it is too large
-			half_len = int(len(cmd)/2)
-			cmd1 = cmd[0:half_len]
-			cmd2 = cmd[half_len:len(cmd)]
-
-			# Put hex command in log, for debugging
-			# hex_cmd = hex(int(cmd,2))
-			hex_cmd1 = hex(int(cmd1,2))
-			hex_cmd2 = hex(int(cmd2,2))
-			# self.logger.info("Hex cmd = {}".format(hex_cmd))
-			cmds.append(cmd) # Append the command to an array
-			# hex_cmds.append(hex_cmd)
-			# Reorder them
-			hex_cmds.append(hex_cmd2)
-			hex_cmds.append(hex_cmd1)
-			line_ctr += 1
-
-			self.logger.info("Hex cmd1 = {}\n".format(hex_cmd1))
-			self.logger.info("Hex cmd2 = {}\n".format(hex_cmd2))
-
-
-		# Make a byte array of hex commands
-		# hex_cmd = format(int(hex_cmd,16),'x') # remove the 0x at the beginning
-
-
-		hex_ints = [int(hex_cmd, 16) for hex_cmd in hex_cmds]
-		self.logger.info("Hex ints = {}\n".format(hex_ints))
-
-		# Convert to byte array
-		b = bytes()
-		hex_bytes = [struct.pack('<I', hex_int) for hex_int in hex_ints]
-		b = b.join(hex_bytes)
-
-		# Logging
-		self.logger.info("Hex bytes = {}\n".format(hex_bytes))
-		self.logger.info("Length of hex bytes = {}\n".format(len(hex_bytes)))
-		self.logger.info("b = {}".format(b))
-		self.logger.info("Length of byte array = {}".format(len(b)))
-
-		# # Binary file
-		# with open('out_bin.txt', "w") as out_file:
-		# 	[out_file.write("{}\n".format(cmd)) for cmd in cmds]
-        #
-		# # Hex file
-		# with open('out_hex.txt', "w") as out_file:
-		# 	[out_file.write("{}\n".format(hex_cmd)) for hex_cmd in hex_cmds]
-		# self.logger.info('Done')
-
-		# Machine code file
-		output_filename = inp_file[0:-4] + '_hex.txt'
-		with open(output_filename, "w") as out_file:
-			idx = 0
-			for hex_cmd in hex_cmds:
-				# # for generating only machine cmd
-				# if idx%2: # odd idx, even row num
-				# 	out_file.write("pulseq_memory[{}] = {};\n\n".format(idx, hex_cmd))
-				# else: # even idx, odd row num
-				# 	out_file.write("pulseq_memory[{}] = {}; \n".format( idx, hex_cmd))
-
-				# for generating readable machine code
-				if idx%2: # odd idx, even row num
-					out_file.write("\tpulseq_memory[{}] = {}\n\n".format(idx, hex_cmd))
-				else: # even idx, odd row num
-					out_file.write("A[{}]\tpulseq_memory[{}] = {} \n".format( hex(int(idx/2)),
-								   idx, hex_cmd))
-				idx += 1
-
-		f.close()
+		with open(inp_file) as f:
+			text = f.read()
+		b = self.assemble_text(text, parameters, use_cache)
+
+		if listing:
+			# Machine code file
+			output_filename = inp_file[0:-4] + '_hex.txt'
+			with open(output_filename, "w") as out_file:
+				out_file.writelines(self.listing(text, parameters))
+			for message in self.diagnostics(text, parameters):
+				self.logger.debug(message)
 		return b
 
 assembler = Assembler()
 
 # Sample usage
 if __name__ == "__main__":
+	logging.basicConfig(filename = 'assembler.log', filemode = 'w', level = logging.DEBUG)
 	a = Assembler()
 	inp_file = 'sequence/basic/se_default.txt'
-	hex_bytes = a.assemble(inp_file)
+	hex_bytes = a.assemble(inp_file, listing = True)
 	#print("Hex bytes = {}\n".format(hex_bytes))
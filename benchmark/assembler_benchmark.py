@@ -0,0 +1,157 @@
+"""
+Assembler Benchmark
+
+@version:   1.0
+@change:    17/10/2026
+
+@summary:   Compares the integer instruction encoder of the assembler with the former
+            string based encoder on the shipped sequences and on synthetic programs.
+            Run from the project root: python -m benchmark.assembler_benchmark
+
+@status:    Under testing
+@todo:
+
+"""
+
+import math
+import struct
+import timeit
+import numpy as np
+from assembler import Assembler, slot_pattern, parse_slot, eval_slot
+from globalvars import sqncs
+
+
+class StringEncoder(Assembler):
+    """
+    Former string based encoder, kept as reference for output and timing
+    """
+    def var_parser(self, line):
+        line = line.replace(' ', '')
+        equals_index = line.find('=')
+        cmd = line[equals_index + 1:len(line)]
+        var_name = line[0:equals_index]
+        cmds_bit = []
+        for word in cmd.split('|'):
+            if any(str.isdigit(c) for c in word):
+                self.var_table[var_name] = self.pc
+                self.pc += 1
+                return format(int(word, 16), 'b').zfill(64)
+            cmds_bit.append(self.bit_table[word])
+        cmd_out = format(np.bitwise_or.reduce(np.array(cmds_bit)), 'b').zfill(64)
+        self.var_table[var_name] = self.pc
+        self.pc += 1
+        return cmd_out
+
+    def make_cmd(self, line):
+        line = line.split(' ')
+        opcode = line[0]
+        opcode_bin = format(self.opcode_table[opcode][0], 'b').zfill(6)
+
+        if len(self.opcode_table[opcode]) < 2:
+            cmd = opcode_bin + '0'.zfill(64 - len(opcode_bin))
+        elif self.opcode_table[opcode][1] == 'A':
+            reg_addr = format(int(line[1], 10), 'b').zfill(5)
+            if opcode == 'LD64' or opcode == 'JNZ':
+                if line[2] in self.var_table.keys():
+                    addr = self.var_table[line[2]]
+                else:
+                    addr = int(line[2], 16)
+                dir_addr = format(int(addr), 'b').zfill(32)
+            elif opcode == 'DEC' or opcode == 'INC':
+                dir_addr = '0'.zfill(32)
+            else:
+                dir_addr = format(int(line[1], 16), 'b').zfill(32)
+                reg_addr = '0'.zfill(5)
+            remainder = '0'.zfill(64 - len(opcode_bin) - len(reg_addr) - len(dir_addr))
+            cmd = opcode_bin + remainder + reg_addr + dir_addr
+            self.pc += 1
+        else:
+            if opcode == 'PR':
+                num_cycles = math.floor(int(line[2]) * (1 / 7e-3))
+                const = format(num_cycles, 'b').zfill(40)
+                reg_addr = format(int(line[1]), 'b')
+                remainder = '0'.zfill(64 - len(const) - len(opcode_bin) - len(reg_addr))
+                cmd = opcode_bin + remainder + reg_addr + const
+            else:
+                const = format(int(line[1], 10), 'b').zfill(40)
+                cmd = opcode_bin + '0'.zfill(64 - len(const) - len(opcode_bin)) + const
+        return cmd
+
+    def encode_bytes(self, lines) -> bytes:
+        """
+        Former assemble routine without file output
+        @param lines:   Source lines
+        @return:        Byte image
+        """
+        self.pc = 0
+        self.var_table = {}
+        hex_cmds = []
+        for line in lines:
+            line_stripped = self.strip_lines(line)
+            if '=' in line_stripped:
+                cmd = self.var_parser(line_stripped)
+            else:
+                cmd = self.make_cmd(line_stripped)
+            half_len = int(len(cmd) / 2)
+            hex_cmds.append(hex(int(cmd[half_len:len(cmd)], 2)))
+            hex_cmds.append(hex(int(cmd[0:half_len], 2)))
+        return bytes().join([struct.pack('<I', int(hex_cmd, 16)) for hex_cmd in hex_cmds])
+
+
+def synthetic_program(n_lines: int = 10000) -> list:
+    """
+    Generate a synthetic program with all instruction formats
+    @param n_lines: Number of source lines
+    @return:        Source lines
+    """
+    lines = ['J 10',
+             'LOOP_CTR = 0x1',
+             'CMD3 = 0x2',
+             'CMD5 = TX_GATE | TX_PULSE | RX_PULSE',
+             'CMD9 = TX_GATE | TX_PULSE | RX_PULSE | GRAD_PULSE']
+    body = ['LD64 2, LOOP_CTR',
+            'LD64 3, CMD3',
+            'TXOFFSET 2000',
+            'PR 5, 120\t// RF 90',
+            'PR 3, 4888',
+            'NOP',
+            'DEC 2',
+            'JNZ 2, 0x1D']
+    while len(lines) < n_lines - 1:
+        lines.append(body[len(lines) % len(body)])
+    lines.append('HALT')
+    return lines
+
+
+def run(repeat: int = 5) -> None:
+    """
+    Run benchmark and print results
+    @param repeat:  Timing repetitions, the best run is reported
+    @return:        None
+    """
+    encoder = Assembler()
+    reference = StringEncoder()
+
+    programs = {}
+    for sqnc in [sqncs.FID, sqncs.SE, sqncs.IR, sqncs.SIR, sqncs.imgSE]:
+        with open(sqnc.path) as f:
+            # The string encoder has no timing slots, insert the default delays
+            text = slot_pattern.sub(lambda slot: str(int(eval_slot(parse_slot(slot.group(1)), sqnc.parameters))), f.read())
+        programs[sqnc.path] = text.splitlines()
+        # Patched template of the sequence file equals the program with the delays written out
+        if encoder.assemble(sqnc.path, sqnc.parameters, use_cache=False) != reference.encode_bytes(programs[sqnc.path]):
+            raise AssertionError("Patched template of {} differs".format(sqnc.path))
+    programs['synthetic (10k lines)'] = synthetic_program(10000)
+
+    print("{:<30} {:>12} {:>12} {:>8}".format("program", "string [ms]", "integer [ms]", "speedup"))
+    for name, lines in programs.items():
+        if encoder.encode(lines).tobytes() != reference.encode_bytes(lines):
+            raise AssertionError("Output of {} differs".format(name))
+        number = max(1, int(20000 / len(lines)))
+        t_str = min(timeit.repeat(lambda: reference.encode_bytes(lines), number=number, repeat=repeat)) / number
+        t_int = min(timeit.repeat(lambda: encoder.encode(lines).tobytes(), number=number, repeat=repeat)) / number
+        print("{:<30} {:>12.3f} {:>12.3f} {:>7.1f}x".format(name, t_str * 1e3, t_int * 1e3, t_str / t_int))
+
+
+if __name__ == '__main__':
+    run()
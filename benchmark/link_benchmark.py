@@ -0,0 +1,173 @@
+"""
+Link Benchmark
+
+@version:   1.0
+@change:    17/10/2026
+
+@summary:   Round-trip latency and sustained throughput of the server link, measured with 'test_throughput'
+            requests over a sweep of payload sizes and concurrency (requests in flight).
+            Measures the plain-socket client and, if PyQt5 is available, the Qt client (CommunicationManager).
+            Without --host a local mock console is started. Results are written as JSON.
+            Run from the project root: python -m benchmark.link_benchmark [--host 10.42.0.100] [--output file]
+
+@status:    Under testing
+@todo:
+
+"""
+
+import argparse
+import json
+import platform
+import socket
+import time
+import msgpack
+import numpy as np
+from server.receivebuffer import ReceiveBuffer
+from server.server_comms import construct_packet, version_full
+
+defaultSizes = [10, 1000, 10000, 100000]
+defaultConcurrency = [1, 4, 16]
+
+
+def socketClient(host: str, port: int, size: int, concurrency: int, requests: int) -> [list, int]:
+    """
+    Plain-socket client, keeps up to concurrency requests in flight
+    @return:    Round-trip latencies in s and received bytes
+    """
+    sock = socket.create_connection((host, port))
+    sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    buffer = ReceiveBuffer()
+    sent: dict = {}
+    latencies: list = []
+    idx = 0
+    with sock:
+        while len(latencies) < requests:
+            while len(sent) < concurrency and idx < requests:
+                idx += 1
+                sent[idx] = time.perf_counter()
+                sock.sendall(msgpack.packb(construct_packet({'test_throughput': size}, idx)))
+            if not buffer.recv_into(sock):
+                raise ConnectionError("Connection closed by server")
+            for reply in buffer:
+                latencies.append(time.perf_counter() - sent.pop(reply[1]))
+    return latencies, buffer.received
+
+
+def qtClient(host: str, port: int, size: int, concurrency: int, requests: int) -> [list, int]:
+    """
+    Qt client (CommunicationManager), keeps up to concurrency requests in flight
+    @return:    Round-trip latencies in s and received bytes
+    """
+    from PyQt5.QtCore import QEventLoop
+    from server.communicationmanager import CommunicationManager
+
+    client = CommunicationManager()
+    if not client.connectClient(host, port):
+        raise ConnectionError("Connection to {}:{} failed".format(host, port))
+    latencies: list = []
+    received = client.bytesReceived
+    loop = QEventLoop()
+
+    def send():
+        if len(latencies) + client.inFlight >= requests:
+            return
+        start = time.perf_counter()
+        future = client.request(construct_packet({'test_throughput': size}))
+        future.add_done_callback(lambda _: done(start))
+
+    def done(start):
+        latencies.append(time.perf_counter() - start)
+        if len(latencies) == requests:
+            loop.quit()
+        send()
+
+    for _ in range(concurrency):
+        send()
+    loop.exec_()
+    received = client.bytesReceived - received
+    client.disconnectClient()
+    return latencies, received
+
+
+def measure(client, host: str, port: int, size: int, concurrency: int, requests: int) -> dict:
+    """
+    Measure one point of the sweep
+    @return:    Result record
+    """
+    t_start = time.perf_counter()
+    latencies, received = client(host, port, size, concurrency, requests)
+    duration = time.perf_counter() - t_start
+    p50, p90, p99 = np.percentile(np.array(latencies) * 1e3, [50, 90, 99])
+    return {
+        'size': size,
+        'concurrency': concurrency,
+        'requests': requests,
+        'bytes_per_reply': received / requests,
+        'latency_ms': {'p50': p50, 'p90': p90, 'p99': p99, 'max': max(latencies) * 1e3},
+        'throughput_MBps': received / duration / 1e6,
+        'requests_per_s': requests / duration,
+    }
+
+
+def run(host: str = None, port: int = 11111, sizes: list = None, concurrency: list = None,
+        requests: int = 50, output: str = 'link_benchmark.json') -> dict:
+    """
+    Run benchmark, print and write results
+    @param host:        Server address, a local mock console is started if None
+    @param port:        Server port
+    @param sizes:       Array lengths of the 'test_throughput' requests
+    @param concurrency: Numbers of requests in flight
+    @param requests:    Requests per point of the sweep
+    @param output:      Path of the JSON result file
+    @return:            Results
+    """
+    if host is None:
+        from server.mockconsole import startInThread
+        console = startInThread()
+        host, port = console.host, console.port
+
+    clients = {'socket': socketClient}
+    try:
+        from PyQt5.QtCore import QCoreApplication
+        app = QCoreApplication.instance() or QCoreApplication([])
+        clients['qt'] = qtClient
+    except ImportError:
+        print("PyQt5 not available, Qt client skipped.")
+
+    results = {
+        'host': host,
+        'port': port,
+        'version': version_full,
+        'platform': platform.platform(),
+        'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'results': {},
+    }
+    print("{:<8} {:>8} {:>5} {:>12} {:>9} {:>9} {:>9} {:>10}".format(
+        "client", "size", "conc", "bytes/reply", "p50 [ms]", "p90 [ms]", "p99 [ms]", "MB/s"))
+    for name, client in clients.items():
+        records = []
+        for size in sizes or defaultSizes:
+            for n_flight in concurrency or defaultConcurrency:
+                record = measure(client, host, port, size, n_flight, requests)
+                records.append(record)
+                print("{:<8} {:>8} {:>5} {:>12.0f} {:>9.3f} {:>9.3f} {:>9.3f} {:>10.2f}".format(
+                    name, size, n_flight, record['bytes_per_reply'], record['latency_ms']['p50'],
+                    record['latency_ms']['p90'], record['latency_ms']['p99'], record['throughput_MBps']))
+        results['results'][name] = records
+
+    with open(output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print("Results written to {}".format(output))
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Link throughput and latency benchmark")
+    parser.add_argument('--host', default=None, help="server address, local mock console if omitted")
+    parser.add_argument('--port', type=int, default=11111)
+    parser.add_argument('--sizes', type=int, nargs='+', default=defaultSizes)
+    parser.add_argument('--concurrency', type=int, nargs='+', default=defaultConcurrency)
+    parser.add_argument('--requests', type=int, default=50)
+    parser.add_argument('--output', default='link_benchmark.json')
+    args = parser.parse_args()
+    run(args.host, args.port, args.sizes, args.concurrency, args.requests, args.output)
@@ -0,0 +1,118 @@
+"""
+Metrics Benchmark
+
+@version:   1.0
+@change:    17/10/2026
+
+@summary:   Compares the single-pass spectral metrics with the former DataManager evaluation methods,
+            called as in AcquisitionManager.getOutputParameterObject, on synthetic 50k-point spectra.
+            Run from the project root: python -m benchmark.metrics_benchmark
+
+@status:    Under testing
+@todo:
+
+"""
+
+import timeit
+import numpy as np
+from spectralmetrics import spectralMetrics
+
+timePerSample = 4e-3  # ms, see DataManager
+
+
+class FormerMetrics:
+    """
+    Former evaluation methods of DataManager, kept as reference for output and timing
+    """
+    def __init__(self, data: np.ndarray, frequency: float, samples: int, f_range: int = 250000):
+        self.samples = samples
+        self.f_range = f_range
+        self._frequency = frequency
+        self._t_magnitudeCon = np.convolve(np.abs(data), np.ones((50,)) / 50, mode='same')
+        self._f_axis = np.linspace(-f_range / 2, f_range / 2, samples)
+        self._f_fftData = np.fft.fftshift(np.fft.fft(np.fft.fftshift(data), n=samples))
+        self._f_fftMagnitude = abs(self._f_fftData)
+
+    def get_fwhm(self, f_fwhmWindow: int = 1000) -> [int, float, float]:
+        if not self.is_evaluateable():
+            return [0, float("nan"), float("nan")]
+        [_peakValue, _, _peakIdx, _peakFreq] = self.get_peakparameters()
+        fft = self._f_fftMagnitude[int(_peakIdx - f_fwhmWindow / 2):int(_peakIdx + f_fwhmWindow / 2)]
+        candidates: np.ndarray = np.abs([x - _peakValue / 2 for x in fft])
+        _winC = int(f_fwhmWindow / 2)
+        _fwhm: int = np.argmin(candidates[_winC:-1]) + _winC - np.argmin(candidates[0:_winC])
+        _fwhm_hz: float = _fwhm * (abs(np.min(self._f_axis)) + abs(np.max(self._f_axis))) / self.samples
+        return [_fwhm, _fwhm_hz, _fwhm_hz / _peakFreq]
+
+    def get_snr(self, f_windowfactor: float = 10) -> float:
+        if not self.is_evaluateable():
+            return float("nan")
+        [_fwhm, _, _] = self.get_fwhm()
+        [_signalValue, _, _signalIdx, _] = self.get_peakparameters()
+        _peakWin = int(_fwhm * f_windowfactor)
+        _winC = int(len(self._f_fftData) / 2)
+        _noiseBorder = int(len(self._f_fftData) * 0.05)
+        _noiseFloor = np.concatenate((self._f_fftData[_noiseBorder:int(_winC - _peakWin / 2)],
+                                      self._f_fftData[int(_winC + _peakWin / 2):-1 - _noiseBorder]))
+        return round(1 / np.std(_noiseFloor / _signalValue))
+
+    def get_peakparameters(self) -> [float, float, int, float]:
+        if not self.is_evaluateable():
+            return [float("nan"), float("nan"), 0, float("nan")]
+        t_signalValue: float = round(np.max(self._t_magnitudeCon), 4)
+        f_signalValue: float = round(np.max(self._f_fftMagnitude), 4)
+        f_signalIdx: int = np.argmax(self._f_fftMagnitude)
+        f_signalFrequency: float = round(self._frequency + ((f_signalIdx - self.samples / 2)
+                                                            * self.f_range / self.samples) / 1.0e6, 6)
+        return [f_signalValue, t_signalValue, f_signalIdx, f_signalFrequency]
+
+    def is_evaluateable(self) -> bool:
+        return max(self._f_fftMagnitude) - min(self._f_fftMagnitude) > 1
+
+    def outputValues(self) -> list:
+        """
+        Evaluation calls of the former getOutputParameterObject
+        """
+        return [self.get_snr(), self.get_fwhm()[1], self.get_fwhm()[2],
+                self.get_peakparameters()[1], self.get_peakparameters()[3]]
+
+
+def spectrum(samples: int, linewidth: float, seed: int = 0) -> np.ndarray:
+    """
+    Synthetic FID, Lorentzian line with noise
+    @param samples:     Number of samples
+    @param linewidth:   Decay time in ms
+    @param seed:        Seed of the noise
+    @return:            Complex samples
+    """
+    rng = np.random.default_rng(seed)
+    t = np.arange(samples) * timePerSample
+    data = np.exp(-t / linewidth) * np.exp(2j * np.pi * 1.5 * t)
+    return (data + 0.01 * (rng.standard_normal(samples) + 1j * rng.standard_normal(samples))).astype(np.complex64)
+
+
+def run(samples: int = 50000, repeat: int = 5, number: int = 10) -> None:
+    """
+    Run benchmark and print results
+    @param samples: Points of the spectra
+    @param repeat:  Timing repetitions, the best run is reported
+    @param number:  Evaluations per timing run
+    @return:        None
+    """
+    print("{:<24} {:>12} {:>12} {:>8}".format("spectrum", "former [ms]", "single [ms]", "speedup"))
+    for name, linewidth in [("narrow line (T2 20 ms)", 20.0), ("broad line (T2 2 ms)", 2.0)]:
+        reference = FormerMetrics(spectrum(samples, linewidth), 11.29, samples)
+        args = (reference._f_fftData, reference._f_fftMagnitude, reference._t_magnitudeCon, 11.29, 250000)
+        metrics = spectralMetrics(*args)
+        values = [metrics.snr, metrics.fwhmHz, metrics.fwhmPpm, metrics.timePeakValue, metrics.peakFrequency]
+        if values != reference.outputValues():
+            raise AssertionError("Metrics of {} differ".format(name))
+
+        t_former = min(timeit.repeat(reference.outputValues, number=number, repeat=repeat)) / number
+        t_single = min(timeit.repeat(lambda: spectralMetrics(*args), number=number, repeat=repeat)) / number
+        print("{:<24} {:>12.3f} {:>12.3f} {:>7.1f}x".format(name, t_former * 1e3, t_single * 1e3,
+                                                           t_former / t_single))
+
+
+if __name__ == '__main__':
+    run()
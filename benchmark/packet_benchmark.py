@@ -0,0 +1,88 @@
+"""
+Packet Benchmark
+
+@version:   1.0
+@change:    17/10/2026
+
+@summary:   Packets per second of acquisition requests built from the packet template against msgpack.packb,
+            for the default operations and an operation with gradient memory.
+            packb:      full packet of a prebuilt payload
+            operation:  payload constructed from the operation and packed, the path of every client request
+            template:   template build of the varying fields
+            cached:     cached operation template including the check of the operation for changes
+            The speedup compares the cached template with the operation path.
+            Run from the project root: python -m benchmark.packet_benchmark
+
+@status:    Under testing
+@todo:
+
+"""
+
+import timeit
+import msgpack
+import numpy as np
+from operationmodes import defaultoperations
+from server.packettemplate import operationTemplate
+from server.protocol import propertyPayload, sequencePayload
+from server.server_comms import construct_packet
+
+
+class GradientOperation:
+    """
+    Stand-in operation with gradient waveforms in the payload
+    """
+    def __init__(self, operation, samples: int = 1000):
+        self.pulsesequence = operation.pulsesequence
+        self.systemproperties = dict(operation.systemproperties)
+        waveform = (np.sin(np.linspace(0, np.pi, samples)) * 0x7fff).astype('<i4').tobytes()
+        for axis in ['x', 'y', 'z']:
+            self.systemproperties['grad_' + axis] = [waveform, '', 'grad_mem_' + axis]
+
+
+def operationPacket(operation, packetIdx: int, fields: dict) -> bytes:
+    """
+    Packet of an operation without template
+    @param operation:   Operation object
+    @param packetIdx:   Packet index
+    @param fields:      Varying fields of the payload
+    @return:            Packet bytes
+    """
+    payload = {**sequencePayload(operation), **propertyPayload(operation), **fields}
+    return msgpack.packb(construct_packet(payload, packetIdx))
+
+
+def run(repeat: int = 7, number: int = 20000) -> None:
+    """
+    Run benchmark and print results
+    @param repeat:  Timing repetitions, the best run is reported
+    @param number:  Packets per timing run
+    @return:        None
+    """
+    operations = dict(defaultoperations)
+    operations['gradient memory (3 x 4 kB)'] = GradientOperation(next(iter(defaultoperations.values())))
+    fields = {'acq': 50000}
+
+    print("{:<28} {:>7} {:>12} {:>12} {:>12} {:>12} {:>8}".format(
+        "operation [pkt/s]", "bytes", "packb", "operation", "template", "cached", "speedup"))
+    for name, operation in operations.items():
+        template = operationTemplate(operation)
+        payload = template.payload(fields)
+        reference = msgpack.packb(construct_packet(payload, 12345))
+        # Same bytes as packb of the template payload, same packet as the operation (order of the keys aside)
+        if template.build(12345, fields) != reference or \
+                msgpack.unpackb(reference) != msgpack.unpackb(operationPacket(operation, 12345, fields)):
+            raise AssertionError("Packet of {} differs".format(name))
+
+        timings = [lambda: msgpack.packb(construct_packet(payload, 12345)),
+                   lambda: operationPacket(operation, 12345, fields),
+                   lambda: template.build(12345, fields),
+                   lambda: operationTemplate(operation).build(12345, fields)]
+        t_packb, t_operation, t_template, t_cached = \
+            [min(timeit.repeat(timing, number=number, repeat=repeat)) / number for timing in timings]
+        print("{:<28} {:>7} {:>12.0f} {:>12.0f} {:>12.0f} {:>12.0f} {:>7.1f}x".format(
+            name[:28], len(reference), 1 / t_packb, 1 / t_operation, 1 / t_template, 1 / t_cached,
+            t_operation / t_cached))
+
+
+if __name__ == '__main__':
+    run()
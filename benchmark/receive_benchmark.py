@@ -0,0 +1,112 @@
+"""
+Receive Benchmark
+
+@version:   1.0
+@change:    17/10/2026
+
+@summary:   Throughput of the receive paths for acquisition replies, measured against a local socket
+            stand-in of the server that answers every request with a reply of complex64 samples.
+            Compares the former read loop (100 and 1024 byte reads) with the bulk receive buffer.
+            Run from the project root: python -m benchmark.receive_benchmark
+
+@status:    Under testing
+@todo:
+
+"""
+
+import socket
+import threading
+import time
+import msgpack
+import numpy as np
+from server.receivebuffer import ReceiveBuffer, acquiredSamples
+from server.server_comms import construct_packet, reply_pkt
+
+
+def serve(listener: socket.socket, samples: int) -> None:
+    """
+    Server stand-in, replies to every request with an acquisition of the given length
+    @param listener:    Listening socket
+    @param samples:     Number of complex64 samples per reply
+    @return:            None
+    """
+    data = (np.arange(samples) * (1 + 1j)).astype(np.complex64).tobytes()
+    connection, _ = listener.accept()
+    unpacker = msgpack.Unpacker()
+    with connection:
+        while True:
+            buf = connection.recv(4096)
+            if not buf:
+                break
+            unpacker.feed(buf)
+            for packet in unpacker:
+                reply = [reply_pkt, packet[1], 0, packet[3], {'acq': data}, {}]
+                connection.sendall(msgpack.packb(reply))
+
+
+def read_loop(sock: socket.socket, packet: list, chunk: int) -> np.ndarray:
+    """
+    Former receive path, reads fixed size chunks until the first reply is decoded
+    """
+    sock.sendall(msgpack.packb(packet))
+    unpacker = msgpack.Unpacker()
+    while True:
+        unpacker.feed(sock.recv(chunk))
+        for reply in unpacker:
+            return np.frombuffer(reply[4]['acq'], np.complex64)
+
+
+def bulk(sock: socket.socket, packet: list, buffer: ReceiveBuffer) -> np.ndarray:
+    """
+    Bulk receive path
+    """
+    sock.sendall(msgpack.packb(packet))
+    while True:
+        if not buffer.recv_into(sock):
+            raise ConnectionError("Connection closed")
+        for reply in buffer:
+            return acquiredSamples(reply)
+
+
+def run(samples: int = 50000, requests: int = 50) -> None:
+    """
+    Run benchmark and print results
+    @param samples:     Samples per acquisition (50000 complex64 = 400 kB)
+    @param requests:    Requests per receive path
+    @return:            None
+    """
+    listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    listener.bind(('127.0.0.1', 0))
+    listener.listen(1)
+    thread = threading.Thread(target=serve, args=(listener, samples), daemon=True)
+    thread.start()
+    sock = socket.create_connection(listener.getsockname())
+    sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    packet = construct_packet({'acq': samples})
+    buffer = ReceiveBuffer()
+    paths = {
+        'read(100)': lambda: read_loop(sock, packet, 100),
+        'recv(1024)': lambda: read_loop(sock, packet, 1024),
+        'bulk receive buffer': lambda: bulk(sock, packet, buffer),
+    }
+    size = samples * np.dtype(np.complex64).itemsize
+
+    print("{} requests, {} samples ({:.0f} kB) per reply".format(requests, samples, size / 1e3))
+    print("{:<22} {:>10} {:>12}".format("receive path", "MB/s", "ms/reply"))
+    for name, receive in paths.items():
+        if len(receive()) != samples:
+            raise AssertionError("Reply of {} incomplete".format(name))
+        t_start = time.perf_counter()
+        for _ in range(requests):
+            receive()
+        duration = time.perf_counter() - t_start
+        print("{:<22} {:>10.1f} {:>12.3f}".format(name, requests * size / duration / 1e6, duration / requests * 1e3))
+
+    sock.close()
+    thread.join()
+    listener.close()
+
+
+if __name__ == '__main__':
+    run()
@@ -12,7 +12,8 @@ Acquisition Manager
 
 """
 
-import numpy as np
+from warnings import warn
+from concurrent.futures import Future
 from PyQt5.QtCore import pyqtSlot
 from manager.acquisitionmanager import AcquisitionManager
 from plotview.spectrumplot import SpectrumPlot
@@ -20,6 +21,7 @@ from operationmodes import defaultoperations
 from operationsnamespace import Namespace as nmpsc
 from PyQt5.QtCore import QObject
 from server.communicationmanager import Com, Commands
+from server.receivebuffer import acquiredSamples
 from manager.datamanager import DataManager
 
 version_major = 0
@@ -38,6 +40,7 @@ class AcquisitionController(QObject):
         self.acquisitionData = None
 
         parent.action_acquire.triggered.connect(self.startAcquisition)
+        parent.action_stop.triggered.connect(self.stopAcquisition)
 
     """
     @pyqtSlot()
@@ -84,7 +87,14 @@ class AcquisitionController(QObject):
         self.parent.clearPlotviewLayout()
         operation = defaultoperations[self.operationlist.getCurrentOperation()]
         frequency = operation.systemproperties[nmpsc.frequency][0]
-        packetIdx: int = 0
+        samples = operation.systemproperties[nmpsc.samples][0]
+        # Advisory only, the requested samples are acquired in any case
+        timing = operation.sequencetiming
+        if timing is not None:
+            if not timing.check_samples(samples):
+                warn("Sequence readout provides {} samples, {} requested.".format(timing.rx_samples, samples))
+            print("Estimated sequence duration: {:.1f} ms".format(timing.duration / 1000))
+        packetIdx: int = 0  # Assigned by Com.request
         command: int = 0    # 0 equals request a packet
         assert version_major < 256 and version_minor < 256 and version_debug < 256, "Version is too high for a byte!"
         version = (version_major << 16) | (version_minor << 8) | version_major
@@ -95,17 +105,45 @@ class AcquisitionController(QObject):
         tmp_package = {**tmp_sequence_pack, **tmp_sequence_pack, **tmp_property_pack}
         fields = [command, packetIdx, 0, version, tmp_package]
 
-        response = Com.sendPacket(fields)
-        if response is None:
+        # Settings acknowledged by the server are not sent again, at fixed settings only 'acq' is sent.
+        # The reply is processed when it is complete, the UI stays responsive meanwhile
+        future = Com.request(fields, delta=True)
+        future.add_done_callback(lambda done: self.processAcquisition(operation, frequency, samples, done))
+
+    @pyqtSlot(bool)
+    def stopAcquisition(self) -> None:
+        """
+        Emergency stop of the running acquisition, pending requests are cancelled
+        @return:    None
+        """
+        Com.emergencyStop()
+
+    def processAcquisition(self, operation, frequency: float, samples: int, future: Future) -> None:
+        """
+        Process the reply of an acquisition request
+        @param operation:   Acquired operation
+        @param frequency:   Frequency of the operation in MHz
+        @param samples:     Expected number of samples
+        @param future:      Completed request
+        @return:            None
+        """
+        if future.cancelled():
+            print("Acquisition stopped.")
+            return
+        if future.exception() is not None:
             print("Nothing received.")
             return
+        response = future.result()
 
-        tmp_data = np.frombuffer(response[4]['acq'], np.complex64)
+        tmp_data = acquiredSamples(response)
 
         # print("Data: {}".format(tmp_data))
         print("Size of received data: {}".format(len(tmp_data)))
+        if len(tmp_data) < samples:
+            warn("Received {} of {} expected samples.".format(len(tmp_data), samples))
+            samples = len(tmp_data)
 
-        dataobject: DataManager = DataManager(tmp_data, frequency, len(tmp_data))
+        dataobject: DataManager = DataManager(tmp_data, frequency, samples)
         f_plotview = SpectrumPlot(dataobject.f_axis, dataobject.f_fftMagnitude, "frequency", "signal intensity")
         t_plotview = SpectrumPlot(dataobject.t_axis, dataobject.t_magnitude, "time", "signal intensity")
         outputvalues = AcquisitionManager().getOutputParameterObject(dataobject, operation.systemproperties)
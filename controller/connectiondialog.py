@@ -29,6 +29,8 @@ class ConnectionDialog(ConnectionDialog_Base, ConnectionDialog_Form):
         self.parent = parent
 
         Com.onStatusChanged.connect(self.setConnectionStatusSlot)
+        Com.onBytesSavedChanged.connect(self.setBytesSavedSlot)
+        self.status = "Unconnected"
 
         # connect interface signals
         self.button_connectToServer.clicked.connect(self.connectClientToServer)
@@ -72,8 +74,9 @@ class ConnectionDialog(ConnectionDialog_Base, ConnectionDialog_Form):
         @param status:  Server connection status
         @return:        None
         """
+        self.status = status
         self.status_label.setText(status)
-        self.parent.status_connection.setText(status)
+        self.setBytesSavedSlot(Com.bytesSaved)
         print(status)
 
         if status == "Connected":
@@ -85,3 +88,15 @@ class ConnectionDialog(ConnectionDialog_Base, ConnectionDialog_Form):
         else:
             self.button_disconnectFromServer.setEnabled(True)
             self.button_connectToServer.setEnabled(True)
+
+    @pyqtSlot(int)
+    def setBytesSavedSlot(self, saved: int = 0) -> None:
+        """
+        Show the upload bytes saved by deduplication with the connection status
+        @param saved:   Saved bytes in this session
+        @return:        None
+        """
+        if saved > 0:
+            self.parent.status_connection.setText("{} ({:.1f} kB upload saved)".format(self.status, saved / 1e3))
+        else:
+            self.parent.status_connection.setText(self.status)
@@ -26,6 +26,7 @@ from PyQt5.QtCore import pyqtSignal, pyqtSlot
 from controller.operationscontroller import OperationsList
 from controller.connectiondialog import ConnectionDialog
 from controller.outputparametercontroller import Output
+from manager.sequencewatcher import SequenceWatcher
 
 from globalvars import StyleSheets as style
 from server.communicationmanager import Com
@@ -59,6 +60,9 @@ class MainViewController(MainWindow_Base, MainWindow_Form):
 
         connectiondialog = ConnectionDialog(self)
 
+        # Hot-reload of edited sequence sources
+        self.sequencewatcher = SequenceWatcher()
+
         # Toolbar Actions
         self.action_connect.triggered.connect(connectiondialog.show)
         self.action_changeappearance.triggered.connect(self.changeAppearanceSlot)
@@ -44,9 +44,8 @@ class OperationsList(QListWidget):
         self._currentOperation = None
 
     def triggeredOperationChanged(self, operation: str = None) -> None:
-        # TODO: set sequence only once right here or on changed signal
-        # packet = Com.constructSequencePacket(operation)
-        # Com.sendPacket(packet)
+        # Upload sequence and settings in the background, acquire only sends the run command
+        Com.prefetch(defaultoperations[operation])
         self._currentOperation = operation
         self.setParametersUI(operation)
 
@@ -0,0 +1,135 @@
+"""
+Disassembler
+
+@version:   1.0
+@change:    17/10/2026
+
+@summary:   Decodes the byte image of an assembled pulse program back into instructions.
+            The decoding is vectorized over the uint32 image; words loaded by LD64 are recovered as variables.
+            A round trip (disassemble, assemble, compare) verifies cached or patched programs without source text.
+            Run from the project root to check all shipped sequences: python disassembler.py
+
+@status:    Under testing
+@todo:
+
+"""
+
+import math
+import numpy as np
+from assembler import Assembler, conversion_factor
+
+_assembler = Assembler()
+opcodeTable: dict = _assembler.opcode_table
+mnemonics: dict = {value[0]: key for key, value in opcodeTable.items()}
+
+instructionType = np.dtype([('opcode', np.int64),
+                            ('register', np.int64),
+                            ('address', np.int64),
+                            ('constant', np.int64),
+                            ('word', np.uint64)])
+
+
+def disassemble(image) -> np.ndarray:
+    """
+    Decode all instructions of a program
+    @param image:   Program as bytes or uint32 array (low half of each 64 bit word first)
+    @return:        Structured array with opcode, register, address, constant (40 bit) and raw word
+    """
+    if isinstance(image, np.ndarray):
+        image = np.ascontiguousarray(image, dtype='<u4')
+    image = np.frombuffer(image, dtype='<u4')
+    if len(image) % 2:
+        raise ValueError("Program has an odd number of 32 bit words")
+    low = image[0::2].astype(np.int64)
+    high = image[1::2].astype(np.int64)
+
+    instructions = np.zeros(len(low), dtype=instructionType)
+    instructions['opcode'] = high >> 26
+    instructions['word'] = high.astype(np.uint64) << np.uint64(32) | low.astype(np.uint64)
+    is_pr = instructions['opcode'] == opcodeTable['PR'][0]
+    # Format A: 5 bit register at bit 32, format B (PR): register at bit 40
+    instructions['register'] = np.where(is_pr, (high >> 8) & 0x3ffff, high & 0x1f)
+    instructions['address'] = low
+    instructions['constant'] = (high & 0xff) << 32 | low
+    return instructions
+
+
+def delay_us(cycles: int) -> int:
+    """
+    Get the delay in us that the assembler encodes to the given number of clock cycles
+    @param cycles:  Delay constant of PR
+    @return:        Delay in us (None if no integer delay gives these cycles)
+    """
+    estimate = int(round(cycles / conversion_factor))
+    for delay in (estimate, estimate + 1, estimate - 1):
+        if delay >= 0 and math.floor(delay * conversion_factor) == cycles:
+            return delay
+    return None
+
+
+def to_source(image) -> list:
+    """
+    Reconstruct source lines of a program, variables are named after their address
+    @param image:   Program as bytes or uint32 array
+    @return:        Source lines in assembler syntax
+    """
+    instructions = disassemble(image)
+    is_ld64 = instructions['opcode'] == opcodeTable['LD64'][0]
+    variables = set(instructions['address'][is_ld64].tolist())
+
+    lines: list = []
+    for idx, (opcode, register, address, constant, word) in enumerate(instructions.tolist()):
+        if idx in variables:
+            lines.append("V{:X} = {}".format(idx, hex(word)))
+            continue
+        mnemonic = mnemonics.get(opcode)
+        if mnemonic is None:
+            raise ValueError("Unknown opcode {} at {}".format(bin(opcode), hex(idx)))
+        layout = opcodeTable[mnemonic]
+        if len(layout) < 2:
+            lines.append(mnemonic)
+        elif mnemonic in ('LD64', 'JNZ'):
+            lines.append("{} {}, {}".format(mnemonic, register, hex(address)))
+        elif mnemonic in ('DEC', 'INC'):
+            lines.append("{} {}".format(mnemonic, register))
+        elif layout[1] == 'A':
+            lines.append("{} {}".format(mnemonic, hex(address)))
+        elif mnemonic == 'PR':
+            delay = delay_us(constant)
+            if delay is None:
+                raise ValueError("Delay of {} cycles at {} has no integer us value".format(constant, hex(idx)))
+            lines.append("PR {}, {}".format(register, delay))
+        else:
+            lines.append("{} {}".format(mnemonic, constant))
+    return lines
+
+
+def verify(image) -> bool:
+    """
+    Verify a program by a round trip through source and assembler,
+    checks LD64/jump targets to lie inside the program
+    @param image:   Program as bytes or uint32 array
+    @return:        Program is consistent (true/false)
+    """
+    instructions = disassemble(image)
+    targets = np.isin(instructions['opcode'], [opcodeTable[key][0] for key in ('LD64', 'JNZ', 'J')])
+    if np.any(instructions['address'][targets] >= len(instructions)):
+        return False
+    try:
+        source = "\n".join(to_source(image))
+        reassembled = Assembler().assemble_text(source, use_cache=False)
+    except ValueError:
+        return False
+    return reassembled == np.frombuffer(image, dtype='<u4').tobytes()
+
+
+# Round trip property check over all shipped sequences and a sweep of their timing slots
+if __name__ == "__main__":
+    from globalvars import sqncs
+    rng = np.random.default_rng(0)
+    for sqnc in [sqncs.FID, sqncs.SE, sqncs.IR, sqncs.SIR, sqncs.imgSE]:
+        template = _assembler.load(sqnc.path)
+        values = {key: rng.integers(value, 10 * value + 1, 50) for key, value in sqnc.parameters.items()}
+        variants = [template.patch(sqnc.parameters)] + list(template.patch_batch(values))
+        passed = all([verify(variant) for variant in variants])
+        print("{:<35} {:>3} programs {}".format(sqnc.str, len(variants), "ok" if passed else "FAILED"))
@@ -14,9 +14,11 @@ class SqncObject:
     """
     Sequence object class
     """
-    def __init__(self, name, path):
+    def __init__(self, name, path, parameters=None):
         self.str = name
         self.path = path
+        # Default values of the sequence's timing slots in us
+        self.parameters = parameters or {}
 
 
 class Sequences:
@@ -24,9 +26,9 @@ class Sequences:
     Class with predefined sequences as sequence objects
     """
     FID = SqncObject('Free Induction Decay', 'sequence/FID.txt')
-    SE = SqncObject('Spin Echo', 'sequence/SE_te.txt')
-    IR = SqncObject('Inversion Recovery', 'sequence/IR_ti.txt')
-    SIR = SqncObject('Saturation Inversion Recovery', 'sequence/SIR_ti.txt')
+    SE = SqncObject('Spin Echo', 'sequence/SE_te.txt', {'TE': 10000})
+    IR = SqncObject('Inversion Recovery', 'sequence/IR_ti.txt', {'TI': 5000000})
+    SIR = SqncObject('Saturation Inversion Recovery', 'sequence/SIR_ti.txt', {'TI': 1000})
     imgSE = SqncObject('Spin Echo for Imaging', 'sequence/img/2DSE.txt')
 
 
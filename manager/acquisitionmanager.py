@@ -195,11 +195,12 @@ class AcquisitionManager:
         """
         outputvalues: dict = {}
         if dataobject is not None:
-            outputvalues["SNR"] = round(dataobject.get_snr(), 4)
-            outputvalues["FWHM [Hz]"] = round(dataobject.get_fwhm()[1], 4)
-            outputvalues["FWHM [ppm]"] = round(dataobject.get_fwhm()[2], 4)
-            outputvalues["Center Frequency [MHz]"] = round(dataobject.get_peakparameters()[1], 4)
-            outputvalues["Signal Maximum [V]"] = round(dataobject.get_peakparameters()[3], 4)
+            metrics = dataobject.get_metrics()
+            outputvalues["SNR"] = round(metrics.snr, 4)
+            outputvalues["FWHM [Hz]"] = round(metrics.fwhmHz, 4)
+            outputvalues["FWHM [ppm]"] = round(metrics.fwhmPpm, 4)
+            outputvalues["Center Frequency [MHz]"] = round(metrics.peakFrequency, 4)
+            outputvalues["Signal Maximum [V]"] = round(metrics.timePeakValue, 4)
         # if properties is not None:
             # outputvalues["Sample Time [ms]"] = round(properties[nmspc.sampletime][0], 4)
             # outputvalues["Attenuation"] = round(properties[nmspc.attenuation][0], 4)
@@ -8,6 +8,8 @@ Data Manager
 
 @summary:   Class for managing the data procession of acquired data.
             Processes data in time (t_) and frequency (f_) domain.
+            Derived arrays are computed on first access and cached, construction does not process the data.
+            Peak, FWHM and SNR results are memoized per argument.
 
 @status:    Under testing
 @todo:      Return snr in dB too
@@ -17,12 +19,36 @@ Data Manager
 from PyQt5.QtCore import QObject, pyqtSignal
 from datetime import datetime
 from dataclasses import dataclass
+import functools
+import inspect
 import numpy as np
+from spectralmetrics import SpectralMetrics, spectralMetrics
 
 
 # just for debugging calculations:
 # import matplotlib.pyplot as plt
 timePerSample = 4e-3
+smoothingKernel = np.ones((50,)) / 50  # Moving average of the time domain signal
+
+
+def memoize(method):
+    """
+    Cache the result of an evaluation method per arguments on the data object
+    @param method:  Evaluation method
+    @return:        Memoized method
+    """
+    signature = inspect.signature(method)
+
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        # Positional, keyword and default arguments of the same call share the result
+        bound = signature.bind(self, *args, **kwargs)
+        bound.apply_defaults()
+        key = (method.__name__,) + tuple(bound.arguments.values())[1:]
+        if key not in self._memo:
+            self._memo[key] = method(self, *args, **kwargs)
+        return self._memo[key]
+    return wrapper
 
 
 @dataclass(repr=False, eq=False)
@@ -36,7 +62,8 @@ class DataManager(QObject):
     t2_finished = pyqtSignal()
     uploaded = pyqtSignal(bool)
 
-    __slots__ = ['_t_magnitude',
+    __slots__ = ['_d_cropped',
+                 '_t_magnitude',
                  '_t_real',
                  '_t_imag',
                  '_t_axis',
@@ -44,7 +71,8 @@ class DataManager(QObject):
                  '_t_realCon',
                  '_f_axis',
                  '_f_fftData',
-                 '_f_fftMagnitude']
+                 '_f_fftMagnitude',
+                 '_memo']
 
     def __init__(self, data: np.complex, p_frequency: float, samples: int, f_range: int = 250000):
         """
@@ -58,137 +86,133 @@ class DataManager(QObject):
         self.f_range = f_range
         self.samples = samples
         self.p_ts = self.samples * timePerSample
-
-        d_cropped = self.data[0:self.samples]  # * 2000.0
-        self._t_axis = np.linspace(0, self.p_ts, self.samples)
-        self._t_magnitude = np.abs(d_cropped)
-        self._t_magnitudeCon = np.convolve(self.t_magnitude, np.ones((50,)) / 50, mode='same')
-        self._t_real = np.real(d_cropped)
-        self._t_realCon = np.convolve(self.t_real, np.ones((50,)) / 50, mode='same')
-        self._t_imag = np.imag(d_cropped)
-
         self._frequency = p_frequency
-        self._f_axis = np.linspace(-self.f_range / 2, self.f_range / 2, self.samples)
-        self._f_fftData = np.fft.fftshift(np.fft.fft(np.fft.fftshift(d_cropped), n=self.samples))
-        self._f_fftMagnitude = abs(self.f_fftData)
+
+        # Derived data, computed on first access
+        self._d_cropped = None
+        self._t_axis = None
+        self._t_magnitude = None
+        self._t_magnitudeCon = None
+        self._t_real = None
+        self._t_realCon = None
+        self._t_imag = None
+        self._f_axis = None
+        self._f_fftData = None
+        self._f_fftMagnitude = None
+        self._memo: dict = {}  # Results of the evaluation methods by method and arguments
 
         # self._dataTimestamp = datetime.now().strftime('%m/%d/%Y, %H:%M:%S')
 
+    @property
+    def d_cropped(self):
+        if self._d_cropped is None:
+            self._d_cropped = np.asarray(self.data)[0:self.samples]  # * 2000.0
+        return self._d_cropped
+
     @property
     def t_axis(self):
+        if self._t_axis is None:
+            self._t_axis = np.linspace(0, self.p_ts, self.samples)
         return self._t_axis
 
     @property
     def t_magnitude(self):
+        if self._t_magnitude is None:
+            self._t_magnitude = np.abs(self.d_cropped)
         return self._t_magnitude
 
     @property
     def t_magnitudeCon(self):
+        if self._t_magnitudeCon is None:
+            self._t_magnitudeCon = np.convolve(self.t_magnitude, smoothingKernel, mode='same')
         return self._t_magnitudeCon
 
     @property
     def t_real(self):
+        if self._t_real is None:
+            self._t_real = np.real(self.d_cropped)
         return self._t_real
 
     @property
     def t_realCon(self):
+        if self._t_realCon is None:
+            self._t_realCon = np.convolve(self.t_real, smoothingKernel, mode='same')
         return self._t_realCon
 
     @property
     def t_imag(self):
+        if self._t_imag is None:
+            self._t_imag = np.imag(self.d_cropped)
         return self._t_imag
 
     @property
     def f_axis(self):
+        if self._f_axis is None:
+            self._f_axis = np.linspace(-self.f_range / 2, self.f_range / 2, self.samples)
         return self._f_axis
 
     @property
     def f_fftData(self):
+        if self._f_fftData is None:
+            self._f_fftData = np.fft.fftshift(np.fft.fft(np.fft.fftshift(self.d_cropped), n=self.samples))
         return self._f_fftData
 
     @property
     def f_fftMagnitude(self):
+        if self._f_fftMagnitude is None:
+            self._f_fftMagnitude = np.abs(self.f_fftData)
         return self._f_fftMagnitude
 
     # TODO: Implementation of params-setter (?)
+    @memoize
+    def get_metrics(self, f_fwhmWindow: int = 1000, f_windowfactor: float = 10) -> SpectralMetrics:
+        """
+        Get peak, fwhm, snr and evaluability of the spectrum
+        @param f_fwhmWindow:    Frequency window of the fwhm
+        @param f_windowfactor:  Factor for fwhm to define peak window of the snr
+        @return:                Spectral metrics
+        """
+        return spectralMetrics(self.f_fftData, self.f_fftMagnitude, self.t_magnitudeCon,
+                               self._frequency, self.f_range, f_fwhmWindow, f_windowfactor)
+
     def get_fwhm(self, f_fwhmWindow: int = 1000) -> [int, float, float]:
         """
         Get full width at half maximum
         @param f_fwhmWindow:    Frequency window
         @return:                FWHM in datapoint indices, hertz and ppm
         """
-        if not self.is_evaluateable():
-            return [0, float("nan"), float("nan")]
-
-        [_peakValue, _, _peakIdx, _peakFreq] = self.get_peakparameters()
-        fft = self.f_fftMagnitude[int(_peakIdx - f_fwhmWindow / 2):int(_peakIdx + f_fwhmWindow / 2)]
-        candidates: np.ndarray = np.abs([x - _peakValue / 2 for x in fft])
-        # Calculate index difference by find indices of minima, calculate fwhm in Hz thereafter
-        _winC = int(f_fwhmWindow / 2)
-        _fwhm: int = np.argmin(candidates[_winC:-1]) + _winC - np.argmin(candidates[0:_winC])
-        _fwhm_hz: float = _fwhm * (abs(np.min(self._f_axis)) + abs(np.max(self._f_axis))) / self.samples
-        _fwhm_ppm: float = _fwhm_hz / _peakFreq
-
-        return [_fwhm, _fwhm_hz, _fwhm_ppm]
+        metrics = self.get_metrics(f_fwhmWindow)
+        return [metrics.fwhm, metrics.fwhmHz, metrics.fwhmPpm]
 
     def get_snr(self, f_windowfactor: float = 10) -> float:
         """
         Get signal to noise ratio
         @param f_windowfactor:  Factor for fwhm to define peak window
-        @param n:               N datapoints for moving average
         @return:                SNR
         """
-        if not self.is_evaluateable():
-            return float("nan")
-
-        [_fwhm, _, _] = self.get_fwhm()
-        [_signalValue, _, _signalIdx, _] = self.get_peakparameters()
-        _peakWin = int(_fwhm * f_windowfactor)
-        _winC = int(len(self._f_fftData) / 2)
-        _noiseBorder = int(len(self._f_fftData) * 0.05)
-
-        _noiseFloor = np.concatenate((self._f_fftData[_noiseBorder:int(_winC - _peakWin / 2)],
-                                      self._f_fftData[int(_winC + _peakWin / 2):-1 - _noiseBorder]))
-
-        _noise = np.std(_noiseFloor / _signalValue)
-        _snr = round(1 / _noise)
-
-        return _snr  # TODO: Add return in dB
+        return self.get_metrics(f_windowfactor=f_windowfactor).snr  # TODO: Add return in dB
 
     def get_peakparameters(self) -> [float, float, int, float]:
         """
         Get peak parameters
         @return:            Frequency peak, time domain peak, index of frequency peak and frequency of peak
         """
-        if not self.is_evaluateable():
-            return [float("nan"), float("nan"), 0, float("nan")]
-
-        t_signalValue: float = round(np.max(self._t_magnitudeCon), 4)
-        f_signalValue: float = round(np.max(self._f_fftMagnitude), 4)
-        f_signalIdx: int = np.argmax(self._f_fftMagnitude)  # [0]
-        f_signalFrequency: float = round(self._frequency + ((f_signalIdx - self.samples / 2)
-                                                            * self.f_range / self.samples) / 1.0e6, 6)
-
-        return [f_signalValue, t_signalValue, f_signalIdx, f_signalFrequency]
+        metrics = self.get_metrics()
+        return [metrics.peakValue, metrics.timePeakValue, metrics.peakIdx, metrics.peakFrequency]
 
     @property
+    @memoize
     def get_sign(self) -> int:
         """
         Get sign of real part signal in time domain
         @return:    Sign
         """
-        index: np.ndarray = np.argmin(self._t_realCon[0:50])
-        return np.sign(self._t_realCon[index])
+        index: np.ndarray = np.argmin(self.t_realCon[0:50])
+        return np.sign(self.t_realCon[index])
 
     def is_evaluateable(self) -> bool:
         """
         Check if acquired data is evaluateable
         @return:    Evaluateable (true/false)
         """
-        minValue = min(self._f_fftMagnitude)
-        maxValue = max(self._f_fftMagnitude)
-        difference = maxValue - minValue
-        if difference > 1:
-            return True
-        else:
-            return False
+        return self.get_metrics().evaluable
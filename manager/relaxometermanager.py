@@ -14,9 +14,10 @@ Relaxation Manager
 """
 
 from server.communicationmanager import CommunicationManager as Com
-from .sequencemanager import SequenceManager as SeqHndlr
+from .sequencemanager import SqncMngr as SeqHndlr
 from .acquisitionmanager import AcquisitionManager
 from globalvars import sqncs, rlxs, SqncObject
+from timinganalyzer import analyze
 from scipy.optimize import curve_fit, brentq
 
 import numpy as np
@@ -38,28 +39,22 @@ class RelaxometerManager:
         self.Acq = AcquisitionManager(p_samples)
         self.p_relaxation: str = p_relaxation
 
-    # noinspection PyCallByClass
-    def setTimeValue(self, p_sequence: SqncObject, p_tValue: int) -> None:
+    def get_sequenceVariants(self, p_sequence: SqncObject, p_tValues: list) -> np.ndarray:
         """
-        Set current time by calling sequence manager
+        Get the sequence programs for all time values in one call to the sequence manager
         @param p_sequence:  Sequence that is going to be modified (property)
-        @param p_tValue:    Current time value to be set (TI, TE, ...) (property)
-        @return:            None
+        @param p_tValues:   Time values to be set (TI, TE, ...) in ms (property)
+        @return:            Programs, one row per time value (None if sequence is not valid)
         """
-        if self.p_relaxation is rlxs.T1:
-            if p_sequence.str is sqncs.SIR:
-                SeqHndlr.setSaturationInversionRecovery(p_tValue)
-            elif p_sequence.str is sqncs.IR:
-                SeqHndlr.setInversionRecovery(p_tValue)
-            else:
-                warnings.warn('Relaxation time to be measured or sequence not valid!')
-                return
-        elif self.p_relaxation and rlxs.T2:
-            SeqHndlr.setSpinEcho(p_tValue)
+        tValues = np.asarray(p_tValues, dtype=float)
+        if self.p_relaxation is rlxs.T1 and p_sequence in (sqncs.SIR, sqncs.IR):
+            return SeqHndlr.getVariants(p_sequence, TI=tValues * 1000)
+        elif self.p_relaxation is rlxs.T2 and p_sequence is sqncs.SE:
+            # Echo time of at least 2 ms, as in setSpinEcho
+            return SeqHndlr.getVariants(p_sequence, TE=np.maximum(tValues, 2) * 1000)
         else:
             warnings.warn('Relaxation time to be measured or sequence not valid!')
-            return
-        SeqHndlr.packSequence(p_sequence)
+            return None
 
     def get_relaxationTime(self, p_freq: float, p_sequence: SqncObject, p_tValues: list, p_recovery: int,
                            p_ts: int = 2, **kwargs) \
@@ -80,10 +75,22 @@ class RelaxometerManager:
 
         Com.setFrequency(p_freq)
 
-        for tValue in p_tValues:
+        variants = self.get_sequenceVariants(p_sequence, p_tValues)
+        if variants is None:
+            return
+
+        # Wall-clock estimate from the static timing of every variant
+        try:
+            duration = sum([analyze(variant.tobytes()).duration for variant in variants]) / 1e6
+            estimate = (duration + len(variants) * p_recovery / 1000) * p_averagesPerPoint
+            print("Estimated measurement time: {:.1f} s".format(estimate))
+        except ValueError as error:
+            warnings.warn("Measurement time not estimated: {}".format(error))
+
+        for variant in variants:
             idx_datapoint: int = 0
             tmp_datapointBuffer: list = []
-            self.setTimeValue(p_sequence, tValue)
+            SeqHndlr.packSequence(p_sequence, variant)
             while idx_datapoint < p_averagesPerPoint:
                 time.sleep(p_recovery / 1000)
                 [data, _] = self.Acq.get_spectrum(p_ts)
@@ -7,15 +7,19 @@ Sequence Manager
 @change:    02/05/2020
 
 @summary:   Class for modifying and packing a sequence.
+            Echo and inversion times are set through the timing slots of the sequence templates.
 
 @status:    Under testing
 @todo:
 
 """
 from PyQt5.QtCore import QObject, pyqtSignal
-from assembler import Assembler
+from assembler import Assembler, SequenceTemplate
+from sequencelibrary import library
+from sequenceoptimizer import fit
 from server.communicationmanager import CommunicationManager as Com
 from globalvars import sqncs, SqncObject
+import numpy as np
 
 
 class SequenceManager(QObject):
@@ -30,6 +34,9 @@ class SequenceManager(QObject):
         """
         super(SequenceManager, self).__init__()
         self.assembler = Assembler()
+        # Templates are assembled once, timing changes only patch the delays
+        self.templates: dict = {}
+        self.parameters: dict = {}
         self.flag_sqncs = {
             sqncs.FID.str: False,
             sqncs.SE.str: False,
@@ -37,14 +44,48 @@ class SequenceManager(QObject):
             sqncs.SIR: False
         }
 
+    def getTemplate(self, sqnc: SqncObject) -> SequenceTemplate:
+        """
+        Get the template of a sequence, the source is assembled only on first use.
+        Programs exceeding the pulse memory are optimized.
+        @param sqnc:    Sequence object
+        @return:        Sequence template
+        """
+        if sqnc.path not in self.templates:
+            self.templates[sqnc.path] = fit(library.load(sqnc.path))
+        return self.templates[sqnc.path]
+
+    def getParameters(self, sqnc: SqncObject) -> dict:
+        """
+        Get the current timing slot values of a sequence
+        @param sqnc:    Sequence object
+        @return:        Dict of timing slot values in us
+        """
+        if sqnc.path not in self.parameters:
+            self.parameters[sqnc.path] = dict(sqnc.parameters)
+        return self.parameters[sqnc.path]
+
+    def getVariants(self, sqnc: SqncObject, **values) -> np.ndarray:
+        """
+        Get the programs of a sequence for a sweep of timing slot values
+        @param sqnc:    Sequence object
+        @param values:  Timing slot values in us, vectors of equal length (e.g. TI=[...])
+        @return:        Programs as uint32 array of shape (n_variants, n_words)
+        """
+        return self.getTemplate(sqnc).patch_batch({**self.getParameters(sqnc), **values})
+
     # Function to init and set FID -- only acquire call is necessary afterwards
-    def packSequence(self, sqnc: SqncObject) -> bool:
+    def packSequence(self, sqnc: SqncObject, variant: np.ndarray = None) -> bool:
         """
         Pack a sequence and call upload
         @param sqnc:    Sequence to be packed
+        @param variant: Program from getVariants, uploaded instead of the current parameters
         @return:        None
         """
-        byte_array = self.assembler.assemble(sqnc.path)
+        if variant is None:
+            byte_array = self.getTemplate(sqnc).patch(self.getParameters(sqnc))
+        else:
+            byte_array = variant.tobytes()
         upload = Com.setSequence(byte_array)
 
         self.flag_sqncs = dict.fromkeys(self.flag_sqncs, False)
@@ -54,64 +95,33 @@ class SequenceManager(QObject):
         return upload
 
     # Function to change TE in sequence
-    @staticmethod
-    def setSpinEcho(te: int = 10) -> None:
+    def setSpinEcho(self, te: int = 10) -> None:
         """
         Set a spin echo sequence by changing echo time
         @param te:  Echo time in ms
         @return:    None
         """
-        # Open sequence and read lines
-        f = open(sqncs.SE.path, 'r+')
-        lines = f.readlines()
         if te < 2:
             te = 2
-        # Modify TE time in the 8th last line
-        lines[-10] = 'PR 3, ' + str(int(te / 2 * 1000 - 112)) + '\t// wait&r\n'
-        lines[-6] = 'PR 3, ' + str(int(te / 2 * 1000 - 975)) + '\t// wait&r\n'
-        # Close and write/save modified sequence
-        f.close()
-        with open(sqncs.SE.path, "w") as out_file:
-            for line in lines:
-                out_file.write(line)
+        self.getParameters(sqncs.SE)['TE'] = te * 1000
 
     # Function to set default IR sequence
-    @staticmethod
-    def setInversionRecovery(ti: int = 15) -> None:
+    def setInversionRecovery(self, ti: int = 15) -> None:
         """
         Set inversion recovery sequence by changing time of inversion
         @param ti:  Time of inversion in ms
         @return:    None
         """
-        f = open(sqncs.IR.path, 'r+')  # Open sequence and read lines
-        lines = f.readlines()
-        # Modify TI time in the 8th last line
-        lines[-14] = 'PR 3, ' + str(int(ti * 1000 - 198)) + '\t// wait&r\n'
-        f.close()  # Close and write/save modified sequence
-        with open(sqncs.IR.path, "w") as out_file:
-            for line in lines:
-                out_file.write(line)
+        self.getParameters(sqncs.IR)['TI'] = ti * 1000
 
     # Function to set default SIR sequence
-    @staticmethod
-    def setSaturationInversionRecovery(ti: int = 15) -> None:
+    def setSaturationInversionRecovery(self, ti: int = 15) -> None:
         """
         Set saturation inversion recovery sequence by changing time of inversion
         @param ti:  Time of inversion in ms
         @return:    None
         """
-        f = open(sqncs.SIR.path, 'r+')  # Open sequence and read lines
-        lines = f.readlines()
-        # Modify TI time in the 8th last line
-        # ines[-14] = 'PR 3, ' + str(int(TI * 1000 - 198)) + '\t// wait&r\n'
-        # lines[-18] = 'PR 3, ' + str(int(TI * 1000 - 198)) + '\t// wait&r\n'
-        lines[-9] = 'PR 3, ' + str(int(ti * 1000 - 198)) + '\t// wait&r\n'
-        lines[-13] = 'PR 3, ' + str(int(ti * 1000 - 198)) + '\t// wait&r\n'
-        f.close()  # Close and write/save modified sequence
-        with open(sqncs.SIR.path, "w") as out_file:
-            for line in lines:
-                out_file.write(line)
-
+        self.getParameters(sqncs.SIR)['TI'] = ti * 1000
 
     @staticmethod
     def loadGradientWaveformFromFile():
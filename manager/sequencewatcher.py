@@ -0,0 +1,167 @@
+"""
+Sequence Watcher
+
+@version:   1.0
+@change:    17/10/2026
+
+@summary:   Hot-reload of sequence sources. Watches the files under sequence/ and re-assembles an edited
+            source in a worker thread, re-encoding only the changed lines. The compiled cache, the sequence
+            manager and the affected operations are updated afterwards in the main thread.
+            If the edited source does not assemble, the last good program stays in use.
+
+@status:    Under testing
+@todo:
+
+"""
+
+from PyQt5.QtCore import QObject, QRunnable, QThreadPool, QTimer, QFileSystemWatcher, pyqtSignal, pyqtSlot
+from assembler import Assembler, SequenceTemplate, cache
+from sequencelibrary import sequenceSources
+from sequenceoptimizer import fit
+from manager.sequencemanager import SqncMngr
+from operationmodes import defaultoperations
+import os
+
+reloadDelay = 200  # ms, editors write a file in several steps
+
+
+class ReloadSignals(QObject):
+    """
+    Signals of a reload task, delivered to the main thread
+    """
+    finished = pyqtSignal(str, str, object)
+    failed = pyqtSignal(str, str)
+
+
+class ReloadTask(QRunnable):
+    """
+    Re-assembly of a sequence source in a worker thread
+    """
+    def __init__(self, path: str, old_text: str, template: SequenceTemplate):
+        """
+        Initialization of reload task
+        @param path:        Path of the sequence source
+        @param old_text:    Source text of the last good program
+        @param template:    Last good program
+        """
+        super(ReloadTask, self).__init__()
+        self.path = path
+        self.old_text = old_text
+        self.template = template
+        self.signals = ReloadSignals()
+
+    def run(self) -> None:
+        try:
+            with open(self.path) as f:
+                text = f.read()
+            assembler = Assembler()
+            template = self.template if self.template is not None else assembler.compile(self.old_text, False)
+            # The shared cache is only written from the main thread
+            template = assembler.recompile(template, self.old_text, text, use_cache=False)
+        except (OSError, ValueError, KeyError, IndexError) as e:
+            self.signals.failed.emit(self.path, str(e))
+            return
+        self.signals.finished.emit(self.path, text, template)
+
+
+class SequenceWatcher(QObject):
+    """
+    Sequence watcher class
+    """
+    sequenceReloaded = pyqtSignal(str)
+    reloadFailed = pyqtSignal(str, str)
+
+    def __init__(self, operations: dict = None, directories: list = None):
+        """
+        Initialization of sequence watcher class
+        @param operations:  Operations whose sequences are reloaded, default operations if None
+        @param directories: Directories with sequence sources
+        """
+        super(SequenceWatcher, self).__init__()
+        self.operations = defaultoperations if operations is None else operations
+        self.sources: dict = {}  # Source text and template of the last good program per path
+        self.pending: set = set()
+        self.tasks: dict = {}
+
+        for path in sequenceSources(directories):
+            with open(path) as f:
+                self.sources[path] = [f.read(), None]
+
+        self.watcher = QFileSystemWatcher(list(self.sources.keys()), self)
+        self.watcher.fileChanged.connect(self.fileChangedSlot)
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.timeout.connect(self.reload)
+
+    @pyqtSlot(str)
+    def fileChangedSlot(self, path: str) -> None:
+        """
+        File changed slot function, collects changes until the file is written completely
+        @param path:    Path of the changed source
+        @return:        None
+        """
+        # Editors replacing the file remove it from the watcher
+        if path not in self.watcher.files() and os.path.exists(path):
+            self.watcher.addPath(path)
+        self.pending.add(path)
+        self.timer.start(reloadDelay)
+
+    def reload(self) -> None:
+        """
+        Start the re-assembly of all changed sources in the thread pool
+        @return:    None
+        """
+        for path in list(self.pending):
+            if path in self.tasks or path not in self.sources:
+                continue  # Reloaded again when the running task finished
+            self.pending.discard(path)
+            old_text, template = self.sources[path]
+            task = ReloadTask(path, old_text, template)
+            task.signals.finished.connect(self.reloadFinishedSlot)
+            task.signals.failed.connect(self.reloadFailedSlot)
+            self.tasks[path] = task
+            QThreadPool.globalInstance().start(task)
+
+    @pyqtSlot(str, str, object)
+    def reloadFinishedSlot(self, path: str, text: str, template: SequenceTemplate) -> None:
+        """
+        Use the re-assembled program
+        @param path:        Path of the sequence source
+        @param text:        New source text
+        @param template:    New program
+        @return:            None
+        """
+        del self.tasks[path]
+        self.sources[path] = [text, template]
+        # Library lookups of the edited source now hit the cache
+        cache.put(cache.key(text), template)
+        SqncMngr.templates[path] = fit(template)
+        for operation in self.operations.values():
+            if hasattr(operation, 'sequence') and operation.sequence.path == path:
+                operation.setSequenceTemplate(template)
+
+        print("\n Sequence {} reloaded.".format(path))
+        self.sequenceReloaded.emit(path)
+        self.restart(path)
+
+    @pyqtSlot(str, str)
+    def reloadFailedSlot(self, path: str, message: str) -> None:
+        """
+        Keep the last good program if a source does not assemble
+        @param path:        Path of the sequence source
+        @param message:     Error message
+        @return:            None
+        """
+        del self.tasks[path]
+        print("\n Sequence {} not reloaded, last good program is kept: {}".format(path, message))
+        self.reloadFailed.emit(path, message)
+        self.restart(path)
+
+    def restart(self, path: str) -> None:
+        """
+        Reload a source again if it changed while its task was running
+        @param path:    Path of the sequence source
+        @return:        None
+        """
+        if path in self.pending:
+            self.timer.start(reloadDelay)
@@ -13,11 +13,14 @@ Operation Modes
 """
 
 from warnings import warn
-from globalvars import sqncs
-from assembler import Assembler
+from globalvars import sqncs, SqncObject
+from assembler import SequenceTemplate
+from sequencelibrary import library
+from sequenceoptimizer import fit
+from timinganalyzer import analyze, rxSampleTime, SequenceTiming
 from operationsnamespace import Namespace as nmspc
 from operationsnamespace import Reconstruction as reco
-from server.communicationmanager import Commands as cmd
+from server.protocol import Commands as cmd, fpga_clk_frequency_MHz
 
 
 class Spectrum:
@@ -52,7 +55,31 @@ class Spectrum:
         self._shim_z: int = shim[2]
         self._shim_z2: int = shim[3]
         self._sequence = sequence # sqncs.FID
-        self._sequencebytestream = Assembler().assemble(self._sequence.path)
+        self._sequencebytestream = None  # Loaded from the sequence library on first access
+
+    @property
+    def sequencebytestream(self) -> bytes:
+        """
+        Assembled sequence, taken from the precompiled library on first access.
+        Programs exceeding the pulse memory are optimized.
+        @return:    Sequence bytestream
+        """
+        if self._sequencebytestream is None:
+            template = fit(library.load(self._sequence.path))
+            self._sequencebytestream = template.patch(self._sequence.parameters)
+        return self._sequencebytestream
+
+    @property
+    def sequence(self) -> SqncObject:
+        return self._sequence
+
+    def setSequenceTemplate(self, template: SequenceTemplate) -> None:
+        """
+        Replace the assembled sequence, e.g. after its source was edited
+        @param template:    Sequence template of the operation's sequence
+        @return:            None
+        """
+        self._sequencebytestream = fit(template).patch(self._sequence.parameters)
 
     @property
     def systemproperties(self) -> dict:
@@ -73,13 +100,30 @@ class Spectrum:
             # nmspc.z2_grad: [self._shim_z2, '_shim_z2']
         }
 
+    @property
+    def sequencetiming(self) -> [SequenceTiming, None]:
+        """
+        Static timing analysis of the operation's sequence, the RX sample time follows the rx_rate setting
+        (decimation of the FPGA clock) if the operation has one
+        @return:    Duration, RX windows and RX samples of the sequence, None if it can not be analyzed
+        """
+        sample_time = rxSampleTime
+        for prop in self.systemproperties.values():
+            if len(prop) == 3 and prop[2] == cmd.rxRate:
+                sample_time = prop[0] / fpga_clk_frequency_MHz
+        try:
+            return analyze(self.sequencebytestream, sample_time)
+        except ValueError as error:
+            warn("Sequence timing not analyzed: {}".format(error))
+            return None
+
     # TODO: Different interaction modes -> button to upload sequence/gradient file ?
 
     @property
     def pulsesequence(self) -> dict:
         return {
             nmspc.type: reco.spectrum,
-            nmspc.sequence: [self._sequence, self._sequencebytestream]
+            nmspc.sequence: [self._sequence, self.sequencebytestream]
             # nmspc.gradwaveform: []
 
             # 2D Imaging Implementations:
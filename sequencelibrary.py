@@ -0,0 +1,197 @@
+"""
+Sequence Library
+
+@version:   1.0
+@change:    17/10/2026
+
+@summary:   Precompiled library of the sequences in sequence/ and sequence/img/.
+            The library file is memory-mapped at startup, programs are only read when an operation
+            accesses them. Entries whose source changed since the build are assembled from source.
+            Build the library from the project root: python sequencelibrary.py
+
+            File layout (little endian):
+            header  magic 'GOSL', format version (uint16), reserved (uint16), entry count (uint32)
+            index   per entry: name, source key (both uint16 length + utf-8), word offset, word count and
+                    slot count (uint32 each), per slot: word index (uint32), expression (uint16 length + utf-8)
+            data    64 bit program words of all entries, 8 byte aligned
+
+@status:    Under testing
+@todo:
+
+"""
+
+import glob
+import mmap
+import os
+import struct
+import numpy as np
+from assembler import Assembler, SequenceTemplate, cache
+
+libraryPath = 'sequence/library.bin'
+libraryDirectories = ['sequence', 'sequence/img']
+magic = b'GOSL'
+formatVersion = 1
+headerFormat = '<4sHHI'
+
+
+def _pack_string(text: str) -> bytes:
+    data = text.encode()
+    return struct.pack('<H', len(data)) + data
+
+
+def _unpack_string(buffer, offset: int) -> [str, int]:
+    (length,) = struct.unpack_from('<H', buffer, offset)
+    offset += 2
+    return bytes(buffer[offset:offset + length]).decode(), offset + length
+
+
+class LibraryEntry:
+    """
+    Index entry of a precompiled program
+    """
+    def __init__(self, key: str, offset: int, n_words: int, slots: list):
+        self.key = key
+        self.offset = offset
+        self.n_words = n_words
+        self.slots = slots
+
+
+class SequenceLibrary:
+    """
+    Memory-mapped library of precompiled sequence templates
+    """
+    def __init__(self, path: str = libraryPath):
+        """
+        Initialization of sequence library, maps the file if it exists
+        @param path:    Path of the library file
+        """
+        self.path = path
+        self.entries: dict = {}
+        self._templates: dict = {}
+        self._mmap = None
+        self._data = None
+
+        try:
+            with open(path, 'rb') as f:
+                self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            self._readIndex()
+        except (OSError, ValueError, struct.error):
+            # No library or unreadable library, operations assemble from source
+            self.entries = {}
+
+    def _readIndex(self) -> None:
+        """
+        Read header and index, the program data stays mapped
+        @return:    None
+        """
+        buffer = self._mmap
+        file_magic, version, _, count = struct.unpack_from(headerFormat, buffer, 0)
+        if file_magic != magic or version != formatVersion:
+            raise ValueError("Unknown sequence library format")
+        offset = struct.calcsize(headerFormat)
+        for _ in range(count):
+            name, offset = _unpack_string(buffer, offset)
+            key, offset = _unpack_string(buffer, offset)
+            word_offset, n_words, n_slots = struct.unpack_from('<III', buffer, offset)
+            offset += 12
+            slots = []
+            for _ in range(n_slots):
+                (index,) = struct.unpack_from('<I', buffer, offset)
+                expression, offset = _unpack_string(buffer, offset + 4)
+                slots.append((index, expression))
+            self.entries[name] = LibraryEntry(key, word_offset, n_words, slots)
+        self._data = np.frombuffer(buffer, dtype='<u8', offset=(offset + 7) // 8 * 8)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.entries
+
+    def template(self, name: str) -> SequenceTemplate:
+        """
+        Get the precompiled template of a library entry
+        @param name:    Entry name (path of the sequence source)
+        @return:        Sequence template on the mapped program words
+        """
+        if name not in self._templates:
+            entry = self.entries[name]
+            words = self._data[entry.offset:entry.offset + entry.n_words]
+            self._templates[name] = SequenceTemplate(words, entry.slots)
+        return self._templates[name]
+
+    def load(self, path: str) -> SequenceTemplate:
+        """
+        Get the template of a sequence source, from the library if it is up to date
+        @param path:    Path of the sequence source
+        @return:        Sequence template
+        """
+        with open(path) as f:
+            text = f.read()
+        if path in self.entries and self.entries[path].key == cache.key(text):
+            return self.template(path)
+        return Assembler().compile(text)
+
+    def close(self) -> None:
+        """
+        Release the mapped file
+        @return:    None
+        """
+        self._templates.clear()
+        self._data = None
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+
+
+def sequenceSources(directories: list = None) -> list:
+    """
+    Get the paths of all sequence sources
+    @param directories: Directories with sequence sources (*.txt, listings are skipped)
+    @return:            Paths of the sequence sources
+    """
+    sources: list = []
+    for directory in directories or libraryDirectories:
+        sources += sorted([source for source in glob.glob(os.path.join(directory, '*.txt'))
+                           if not source.endswith('_hex.txt')])
+    return sources
+
+
+def build(path: str = libraryPath, directories: list = None) -> list:
+    """
+    Build the library file from all sequence sources
+    @param path:        Path of the library file
+    @param directories: Directories with sequence sources (*.txt, listings are skipped)
+    @return:            Names of the library entries
+    """
+    sources = sequenceSources(directories)
+    index = b''
+    data: list = []
+    n_words = 0
+    for source in sources:
+        with open(source) as f:
+            text = f.read()
+        template = Assembler().compile(text, use_cache=False)
+        name = source.replace(os.sep, '/')
+        index += _pack_string(name) + _pack_string(cache.key(text))
+        index += struct.pack('<III', n_words, len(template.words), len(template.slots))
+        for slot_index, expression in template.slots:
+            index += struct.pack('<I', slot_index) + _pack_string(expression)
+        data.append(template.words)
+        n_words += len(template.words)
+
+    header = struct.pack(headerFormat, magic, formatVersion, 0, len(sources))
+    padding = b'\0' * (-(len(header) + len(index)) % 8)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(header + index + padding)
+        for words in data:
+            f.write(words.astype('<u8').tobytes())
+    os.replace(tmp_path, path)
+    return [source.replace(os.sep, '/') for source in sources]
+
+
+library = SequenceLibrary()
+
+if __name__ == "__main__":
+    names = build()
+    print("Sequence library {} with {} programs:".format(libraryPath, len(names)))
+    for entry in names:
+        print("  {}".format(entry))
@@ -0,0 +1,253 @@
+"""
+Sequence Optimizer
+
+@version:   1.0
+@change:    17/10/2026
+
+@summary:   Peephole optimizer for assembled pulse programs, to fit long sequences into the pulse memory
+            (the server copies at most 200 32 bit words, i.e. 100 instructions).
+            Passes: remove unreachable words and padding NOPs, remove LD64 into registers that are never read,
+            deduplicate constant variables, merge adjacent PR delays of the same register and turn repeated
+            straight-line blocks into DEC/JNZ loops. Addresses of J, JNZ and LD64 are relocated.
+            Removed NOPs and loop overhead change the timing by a few 7 ns clock cycles, merged delays are exact
+            in clock cycles (and therefore not always expressible in us for disassembler.to_source).
+
+@status:    Under testing
+@todo:
+
+"""
+
+from warnings import warn
+from assembler import SequenceTemplate, DELAY_MASK
+from disassembler import disassemble, opcodeTable
+
+pulseMemoryWords = 200  # 32 bit words copied by update_pulse_sequence_from_upload
+
+NOP = opcodeTable['NOP'][0]
+DEC = opcodeTable['DEC'][0]
+INC = opcodeTable['INC'][0]
+LD64 = opcodeTable['LD64'][0]
+JNZ = opcodeTable['JNZ'][0]
+J = opcodeTable['J'][0]
+HALT = opcodeTable['HALT'][0]
+PR = opcodeTable['PR'][0]
+ADDRESS_MASK = 0xffffffff
+
+
+class Item:
+    """
+    Program word during optimization, references its target word instead of an address
+    """
+    __slots__ = ['word', 'opcode', 'register', 'target', 'slot', 'data']
+
+    def __init__(self, word: int, opcode: int = NOP, register: int = 0, slot: str = None, data: bool = False):
+        self.word = word
+        self.opcode = opcode
+        self.register = register
+        self.target = None
+        self.slot = slot
+        self.data = data
+
+    def key(self):
+        """
+        Comparison key of the instruction, references compare by target
+        """
+        if self.target is None:
+            return self.word
+        return self.word & ~ADDRESS_MASK, id(self.target)
+
+
+def _instruction(opcode: int, register: int = 0, target: Item = None) -> Item:
+    item = Item(opcode << 58 | register << 32, opcode, register)
+    item.target = target
+    return item
+
+
+def _successors(items: list, idx: int) -> list:
+    item = items[idx]
+    if item.opcode == HALT:
+        return []
+    if item.opcode == J:
+        return [item.target]
+    if item.opcode == JNZ:
+        return [item.target] + items[idx + 1:idx + 2]
+    return items[idx + 1:idx + 2]
+
+
+def _decode(template: SequenceTemplate) -> list:
+    """
+    Decode a template into items and resolve the address references
+    """
+    instructions = disassemble(template.words.tobytes())
+    slots = dict(template.slots)
+    items = [Item(int(word), int(opcode), int(register), slots.get(idx))
+             for idx, (opcode, register, word) in
+             enumerate(zip(instructions['opcode'], instructions['register'], instructions['word']))]
+    for item, address in zip(items, instructions['address'].tolist()):
+        if item.opcode in (J, JNZ, LD64):
+            if address >= len(items):
+                raise ValueError("Address {} outside of the program".format(hex(address)))
+            item.target = items[address]
+            if item.opcode == LD64:
+                items[address].data = True
+    return items
+
+
+def _encode(items: list) -> SequenceTemplate:
+    """
+    Relocate the addresses and encode the items into a template
+    """
+    position = {id(item): idx for idx, item in enumerate(items)}
+    words = []
+    slots = []
+    for idx, item in enumerate(items):
+        word = item.word
+        if item.target is not None:
+            word = word & ~ADDRESS_MASK | position[id(item.target)]
+        words.append(word)
+        if item.slot is not None:
+            slots.append((idx, item.slot))
+    return SequenceTemplate(words, slots)
+
+
+def _removeUnreachable(items: list) -> list:
+    index = {id(item): idx for idx, item in enumerate(items)}
+    reachable = set()
+    stack = [0] if items else []
+    while stack:
+        idx = stack.pop()
+        if idx in reachable or idx >= len(items):
+            continue
+        reachable.add(idx)
+        stack += [index[id(successor)] for successor in _successors(items, idx)]
+    loaded = {id(items[idx].target) for idx in reachable if items[idx].opcode == LD64}
+    return [item for idx, item in enumerate(items) if idx in reachable or id(item) in loaded]
+
+
+def _removeNops(items: list) -> list:
+    kept = [item for item in items if item.data or item.opcode != NOP]
+    # Jumps to a removed NOP continue at the next kept word
+    successor = None
+    replacement = {}
+    for item in reversed(items):
+        if item.data or item.opcode != NOP:
+            successor = item
+        else:
+            replacement[id(item)] = successor
+    for item in kept:
+        if item.target is not None and id(item.target) in replacement:
+            item.target = replacement[id(item.target)]
+    return kept
+
+
+def _removeDeadLoads(items: list) -> list:
+    read = {item.register for item in items if not item.data and item.opcode in (PR, DEC, INC, JNZ)}
+    return [item for item in items if item.data or item.opcode != LD64 or item.register in read]
+
+
+def _deduplicateVariables(items: list) -> list:
+    first = {}
+    for item in items:
+        if item.opcode == LD64:
+            item.target = first.setdefault(item.target.word, item.target)
+    used = {id(item.target) for item in items if item.opcode == LD64}
+    return [item for item in items if not item.data or id(item) in used]
+
+
+def _mergeDelays(items: list) -> list:
+    targets = {id(item.target) for item in items if item.target is not None}
+    merged = []
+    for item in items:
+        previous = merged[-1] if merged else None
+        if previous is not None and not item.data and not previous.data \
+                and item.opcode == PR and previous.opcode == PR and item.register == previous.register \
+                and item.slot is None and previous.slot is None and id(item) not in targets:
+            delay = (previous.word & DELAY_MASK) + (item.word & DELAY_MASK)
+            if delay <= DELAY_MASK:
+                previous.word = previous.word & ~DELAY_MASK | delay
+                continue
+        merged.append(item)
+    return merged
+
+
+def _loops(items: list) -> list:
+    """
+    Replace repeated straight-line blocks by LD64/DEC/JNZ loops with a free counter register
+    """
+    used = {item.register for item in items if not item.data}
+    free = [register for register in range(31, 1, -1) if register not in used]
+    if not free or not items or items[-1].opcode not in (HALT, J):
+        return items
+    counter = free[0]
+    targets = {id(item.target) for item in items if item.target is not None}
+    counts: dict = {}
+    result: list = []
+
+    idx = 0
+    while idx < len(items):
+        best = None
+        for length in range(1, (len(items) - idx) // 2 + 1):
+            block = items[idx:idx + length]
+            if any([item.data or item.slot is not None or item.opcode in (J, JNZ, HALT)
+                    or (id(item) in targets and n > 0) for n, item in enumerate(block)]):
+                break
+            keys = [item.key() for item in block]
+            repetitions = 1
+            while [item.key() for item in items[idx + repetitions * length:idx + (repetitions + 1) * length]] == keys \
+                    and not any([id(item) in targets
+                                 for item in items[idx + repetitions * length:idx + (repetitions + 1) * length]]):
+                repetitions += 1
+            saving = (repetitions - 1) * length - 3 - (repetitions not in counts)
+            if repetitions > 1 and saving > 0 and (best is None or saving > best[0]):
+                best = (saving, length, repetitions)
+        if best is None:
+            result.append(items[idx])
+            idx += 1
+            continue
+
+        _, length, repetitions = best
+        body = items[idx:idx + length]
+        if repetitions not in counts:
+            counts[repetitions] = Item(repetitions, data=True)
+        load = _instruction(LD64, counter, counts[repetitions])
+        for item in items:
+            if item.target is body[0]:
+                item.target = load  # Entering the loop reloads the counter
+        result += [load] + body + [_instruction(DEC, counter), _instruction(JNZ, counter, body[0])]
+        idx += repetitions * length
+    # Loop counters are placed behind the last instruction, which never falls through
+    return result + list(counts.values())
+
+
+def optimize(template: SequenceTemplate, loops: bool = True) -> SequenceTemplate:
+    """
+    Optimize an assembled program
+    @param template:    Sequence template
+    @param loops:       Turn repeated blocks into loops
+    @return:            Optimized sequence template
+    """
+    items = _decode(template)
+    items = _removeUnreachable(items)
+    items = _removeDeadLoads(items)
+    items = _removeUnreachable(items)
+    items = _removeNops(items)
+    items = _deduplicateVariables(items)
+    items = _mergeDelays(items)
+    if loops:
+        items = _loops(items)
+    return _encode(items)
+
+
+def fit(template: SequenceTemplate) -> SequenceTemplate:
+    """
+    Optimize a program only if it exceeds the pulse memory
+    @param template:    Sequence template
+    @return:            Template that fits the pulse memory if possible
+    """
+    if 2 * len(template.words) <= pulseMemoryWords:
+        return template
+    optimized = optimize(template)
+    if 2 * len(optimized.words) > pulseMemoryWords:
+        warn("Sequence with {} words exceeds the pulse memory of {} words."
+             .format(2 * len(optimized.words), pulseMemoryWords))
+    return optimized
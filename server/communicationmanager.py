@@ -6,7 +6,18 @@ Communication Manager
 @version:   1.0
 @change:    02/05/2020
 
-@summary:   Manages the connection to the server, constructs and sends packages (via msgpack)
+@summary:   Manages the connection to the server, constructs and sends packages (via msgpack).
+            Requests return futures, replies are decoded from the readyRead signal without blocking the UI.
+            Each request gets an increasing packet index, several requests can be in flight and
+            replies are matched to their request by index.
+            The last acknowledged server settings are mirrored, delta requests only send changed settings.
+            The mirror is invalidated on (re)connection and when the server reports errors.
+            Binary settings (sequence, gradient and RF memory) are mirrored by digest, an identical program
+            is not uploaded twice within a connection; the saved bytes are counted per session.
+            An emergency stop cancels all requests in flight, their late replies are discarded.
+            An established connection is supervised: an idle link is probed with empty requests (keepalive),
+            a lost connection is reestablished with exponential backoff. After reconnection the acknowledged
+            settings of the session are restored and the unanswered and queued requests are resubmitted.
 
 @status:    Under testing
 @todo:
@@ -14,10 +25,12 @@ Communication Manager
 """
 
 from PyQt5.QtNetwork import QAbstractSocket, QTcpSocket
-from PyQt5.QtCore import pyqtSignal, pyqtSlot, QObject
-from operationsnamespace import Namespace as nmspc
+from PyQt5.QtCore import pyqtSignal, pyqtSlot, QObject, QEventLoop, QTimer
+from concurrent.futures import Future
+from server.receivebuffer import ReceiveBuffer
+from server.server_comms import construct_packet, request_pkt, emergency_stop_pkt
+from server.protocol import Commands, ServerState, actionCommands, propertyPayload, sequencePayload, checkReply
 from warnings import warn
-import numpy as np
 import struct
 import msgpack
 
@@ -32,34 +45,10 @@ states = {
 }
 status = QAbstractSocket.SocketState
 
-fpga_clk = 125.0
-
-class Commands:
-    """
-    Commands Class for Marcos-Server
-    """
-    fpgaClock = 'fpga_clk' # array of 3 values unsigned int (clock words)
-    localOscillatorFrequency = 'lo_freq' # unsigned int (local oscillator freq. for TX/RX)
-    txClockDivider = 'tx_div' # unsigned int (clock divider for RF TX samples)
-    rfAmplitude = 'rf_amp' # unsigned int 16 bit (RF amplitude)
-    rxRate = 'rx_rate' # unsigned int 16 bit (tx sample rate???)
-    txSampleSize = 'tx_size' # unsigned int 16 bit (number of TX samples to return)
-    txSamplesPerPulse = 'tx_samples' # unsigned int (number of TX samples per pulse)
-    gradientOffsetX = 'grad_offs_x' # unsigned int (X gradient channel shim)
-    gradientOffsetY = 'grad_offs_y' # unsigned int (Y gradient channel shim)
-    gradientOffsetZ = 'grad_offs_z' # unsigned int (Z gradient channel shim)
-    gradientMemoryX = 'grad_mem_x' # binary byte array (write X gradient channel memory)
-    gradientMemoryY = 'grad_mem_y' # binary byte array (write Y gradient channel memory)
-    gradientMemoryZ = 'grad_mem_z' # binary byte array (write Z gradient channel memory)
-    recomputeTxPulses = 'recomp_pul' # boolean (recompute the TX pulses)
-    txRfWaveform = 'raw_tx_data' # binary byte array (write the RF waveform)
-    sequenceData = 'seq_data' # binary byte array (pulse sequence instructions)
-    runAcquisition = 'acq' # unsigned int [samples] (runs 'seq_data' and returns array of 64-bit complex floats, length = samples)
-    testRxThroughput = 'test_throughput' # unsigned int [arg] (return array map, array-length = arg)
-    requestPacket = 0
-
-# TODO: Create a config file for the following
-fpga_clk_frequency_MHz = 125
+reconnectDelay = 500  # ms, first reconnection attempt, doubled for every failed attempt
+maxReconnectDelay = 30000  # ms
+keepaliveInterval = 5000  # ms, an idle connection is probed in this interval
+keepaliveTimeout = 3000  # ms, the connection is considered lost if a probe is not answered in time
 
 
 class CommunicationManager(QTcpSocket, QObject):
@@ -67,22 +56,54 @@ class CommunicationManager(QTcpSocket, QObject):
     Communication Manager Class
     """
     statusChanged = pyqtSignal(str, name='onStatusChanged')
+    replyReceived = pyqtSignal(object, name='onReplyReceived')
+    bytesSavedChanged = pyqtSignal(int, name='onBytesSavedChanged')
 
     def __init__(self):
         super(CommunicationManager, self).__init__()
+        self._receiver = ReceiveBuffer()
+        self._pending: dict = {}  # Future, sent settings, packet and delta flag of the requests in flight by index
+        self.serverState = ServerState()  # Settings acknowledged by the server
+        self._packetIdx: int = 0
+        self._discarded: set = set()  # Packet indices of stopped requests, their replies are skipped
+        self._queued: list = []  # Future, packet and delta flag of requests waiting for the reconnection
+        self._host = None
+        self._port = None
+        self._supervised: bool = False
+        self._reconnectDelay: int = reconnectDelay
+        self._reconnectTimer = QTimer(self)
+        self._reconnectTimer.setSingleShot(True)
+        self._reconnectTimer.timeout.connect(self.reconnectSlot)
+        self._keepaliveTimer = QTimer(self)
+        self._keepaliveTimer.setInterval(keepaliveInterval)
+        self._keepaliveTimer.timeout.connect(self.keepaliveSlot)
 
         self.stateChanged.connect(self.getConnectionStatus)
+        self.stateChanged.connect(self.superviseSlot)
+        self.connected.connect(self.restoreSession)
+        self.readyRead.connect(self.readReplySlot)
+        self.disconnected.connect(self.abortRequests)
 
-    def connectClient(self, ip: str) -> [bool, int]:
+    def connectClient(self, ip: str, port: int = 11111) -> [bool, int]:
         """
         Connect server and host through server's ip
-        @param ip:  IP address of the server
-        @return:    success of connection
+        @param ip:      IP address of the server
+        @param port:    Port of the server
+        @return:        success of connection
         """
-        self.connectToHost(ip, 11111)
+        self._supervised = False
+        self._reconnectTimer.stop()
+        self._receiver.reset()
+        self.serverState.reset()
+        self.connectToHost(ip, port)
         self.waitForConnected(2000)
         if self.state() == QAbstractSocket.ConnectedState:
             print("Connection to server established.")
+            self._host, self._port = ip, port
+            self._supervised = True
+            self._reconnectDelay = reconnectDelay
+            self.setSocketOption(QAbstractSocket.KeepAliveOption, 1)
+            self._keepaliveTimer.start()
             return True
         else:
             print("Connection to server failed.")
@@ -93,6 +114,10 @@ class CommunicationManager(QTcpSocket, QObject):
         Disconnects server and host
         @return:    success of disconnection
         """
+        self._supervised = False
+        self._reconnectTimer.stop()
+        self._keepaliveTimer.stop()
+        self.failQueued(ConnectionError("Disconnected from server."))
         self.disconnectFromHost()
         if self.state() is QAbstractSocket.UnconnectedState:
             print("Disconnected from server.")
@@ -107,6 +132,80 @@ class CommunicationManager(QTcpSocket, QObject):
         else:
             self.statusChanged.emit(str(state))
 
+    @pyqtSlot(status)
+    def superviseSlot(self, state: status = None) -> None:
+        """
+        Schedule a reconnection attempt if a supervised connection is lost or an attempt failed
+        @param state:   Socket state
+        @return:        None
+        """
+        if state != QAbstractSocket.UnconnectedState or not self._supervised or self._reconnectTimer.isActive():
+            return
+        self._keepaliveTimer.stop()
+        print("Connection to server lost, reconnecting in {:.1f} s.".format(self._reconnectDelay / 1000))
+        self.statusChanged.emit("Reconnecting")
+        self._reconnectTimer.start(self._reconnectDelay)
+        self._reconnectDelay = min(2 * self._reconnectDelay, maxReconnectDelay)
+
+    @pyqtSlot()
+    def reconnectSlot(self) -> None:
+        """
+        Reconnection attempt, does not block
+        @return:    None
+        """
+        if self._supervised and self.state() == QAbstractSocket.UnconnectedState:
+            self.connectToHost(self._host, self._port)
+
+    @pyqtSlot()
+    def restoreSession(self) -> None:
+        """
+        Restore the acknowledged settings of the session and resubmit the queued requests after a reconnection
+        @return:    None
+        """
+        if not self._supervised:
+            return
+        print("Connection to server restored.")
+        self._reconnectDelay = reconnectDelay
+        self._receiver.reset()
+        self.setSocketOption(QAbstractSocket.KeepAliveOption, 1)
+        self._keepaliveTimer.start()
+        queued, self._queued = self._queued, []
+        restore = self.serverState.restorePayload()
+        if restore:
+            self.request(construct_packet(restore))
+        for future, packet, delta in queued:
+            if not future.cancelled():
+                self.submit(future, packet, delta)
+        if queued:
+            print("{} request(s) resubmitted.".format(len(queued)))
+
+    @pyqtSlot()
+    def keepaliveSlot(self) -> None:
+        """
+        Probe an idle connection with an empty request, abort the connection if the probe is not answered in time
+        @return:    None
+        """
+        if self._pending or self.state() != QAbstractSocket.ConnectedState:
+            return  # Replies of busy connections arrive in order, a probe would wait behind them
+        probe = self.request(construct_packet({}))
+
+        def check():
+            if not probe.done() and self._supervised:
+                warn("Keepalive probe not answered, reconnecting.")
+                self.abort()
+        QTimer.singleShot(keepaliveTimeout, check)
+
+    def failQueued(self, exception: Exception) -> None:
+        """
+        Fail the requests waiting for a reconnection
+        @param exception:   Exception of the futures
+        @return:            None
+        """
+        queued, self._queued = self._queued, []
+        for future, _, _ in queued:
+            if not future.done():
+                future.set_exception(exception)
+
     def waitForTransmission(self) -> None:
         """
         Wait until bytes are written on server
@@ -118,56 +217,180 @@ class CommunicationManager(QTcpSocket, QObject):
 
     @staticmethod
     def constructPropertyPacket(operation) -> dict:
+        return propertyPayload(operation)
 
-        packet: dict = {}
-
-        if hasattr(operation, 'systemproperties'):
-            sys_prop = operation.systemproperties
-            for key in list(sys_prop.keys()):
-                if len(sys_prop[key]) == 3:
-                    if key == nmspc.frequency:
-                        # TODO: Find alternative way for this ?
-                        packet[sys_prop[key][2]] = int(np.round(sys_prop[key][0] /
-                                                                fpga_clk_frequency_MHz * (1 << 30))) & 0xfffffff0 | 0xf
-                        continue
-                    packet[sys_prop[key][2]] = sys_prop[key][0]
+    @staticmethod
+    def constructSequencePacket(operation) -> dict:
+        return sequencePayload(operation)
 
-        # TODO: Integrate gradient offsets in gradient waveform (maybe leave it for spectroscopy)
+    @property
+    def inFlight(self) -> int:
         """
-        if hasattr(operation, 'gradientshims'):
-            shim = operation.gradientshims
-            packet[Commands.gradientOffsetX] = shim[nmspc.x_grad][0]
-            packet[Commands.gradientOffsetY] = shim[nmspc.y_grad][0]
-            packet[Commands.gradientOffsetZ] = shim[nmspc.z_grad][0]
+        Number of requests waiting for their reply
         """
-        return packet
+        return len(self._pending)
 
-    @staticmethod
-    def constructSequencePacket(operation) -> dict:
+    @property
+    def bytesReceived(self) -> int:
+        """
+        Number of bytes received from the server
+        """
+        return self._receiver.received
 
-        package: dict = {}
+    @property
+    def bytesSaved(self) -> int:
+        """
+        Upload bytes saved by the server state mirror in this session
+        """
+        return self.serverState.bytesSaved
 
-        if hasattr(operation, 'pulsesequence') and len(operation.pulsesequence) > 1:
-            seq = operation.pulsesequence
-            package[Commands.sequenceData] = seq[nmspc.sequence][1]
-        else:
-            warn("ERROR: No sequence bytestream!")
+    def deltaPayload(self, payload: dict) -> dict:
+        """
+        Remove settings from a payload that the server already acknowledged
+        @param payload: Packet payload
+        @return:        Payload with actions and changed settings
+        """
+        saved = self.serverState.bytesSaved
+        payload = self.serverState.delta(payload)
+        if self.serverState.bytesSaved != saved:
+            self.bytesSavedChanged.emit(self.serverState.bytesSaved)
+        return payload
 
-        return package
+    def request(self, packet: list, delta: bool = False) -> Future:
+        """
+        Send a packet without waiting for the reply, the packet index is assigned here
+        @param packet:  Packet fields [command, packetIdx, 0, version, payload]
+        @param delta:   Send only settings that differ from the acknowledged server state
+        @return:        Future of the reply
+        """
+        return self.submit(Future(), packet, delta)
 
-    def sendPacket(self, packet):
-        self.write(msgpack.packb(packet))
-        unpacker = msgpack.Unpacker()
-        self.waitForReadyRead(1000)
+    def submit(self, future: Future, packet: list, delta: bool = False) -> Future:
+        """
+        Send a packet for a given future, requests are queued while a supervised connection is reestablished
+        @param future:  Future of the reply
+        @param packet:  Packet fields [command, packetIdx, 0, version, payload]
+        @param delta:   Send only settings that differ from the acknowledged server state
+        @return:        Future of the reply
+        """
+        if self.state() != QAbstractSocket.ConnectedState:
+            if self._supervised and self.resubmittable(packet):
+                self._queued.append((future, packet, delta))
+            else:
+                future.set_exception(ConnectionError("Not connected to server."))
+            return future
+        payload = self.deltaPayload(packet[4]) if delta else packet[4]
+        settings = ServerState.payloadSettings(payload)
+        self._packetIdx = (self._packetIdx + 1) & 0xffffffff
+        self._pending[self._packetIdx] = (future, settings, packet, delta)
+        self.write(msgpack.packb([packet[0], self._packetIdx] + list(packet[2:4]) + [payload] + list(packet[5:])))
+        return future
 
-        while True:
-            buf = self.read(100)
-            if not buf:
-                break
-            unpacker.feed(buf)
-            for o in unpacker:  # ugly way of doing it
-                return o  # quit function after 1st reply (could make this a thread in the future)
+    @staticmethod
+    def resubmittable(packet: list) -> bool:
+        """
+        Requests are resubmitted after a reconnection, emergency stops and keepalive probes are not
+        @param packet:  Packet fields
+        @return:        Resubmit packet (true/false)
+        """
+        return packet[0] == request_pkt and bool(packet[4])
 
+    def prefetch(self, operation) -> [Future, None]:
+        """
+        Upload sequence and settings of an operation in the background, acquisitions only send 'acq' once it is acknowledged
+        @param operation:   Operation object
+        @return:            Future of the upload or None if there is nothing to upload
+        """
+        if self.state() != QAbstractSocket.ConnectedState:
+            return None
+        payload = {**self.constructSequencePacket(operation), **self.constructPropertyPacket(operation)}
+        payload = self.deltaPayload({key: value for key, value in payload.items() if key not in actionCommands})
+        if not payload:
+            return None
+        return self.request(construct_packet(payload))
+
+    @pyqtSlot()
+    def readReplySlot(self) -> None:
+        """
+        Decode the received bytes, completes the matching request for every full reply
+        @return:    None
+        """
+        # All available bytes at once, large replies arrive in few blocks
+        self._receiver.feed(self.read(self.bytesAvailable()))
+        for reply in self._receiver:
+            self.replyReceived.emit(reply)
+            if reply[1] in self._discarded:
+                self._discarded.discard(reply[1])
+                continue
+            if reply[1] not in self._pending:
+                warn("Reply to unknown packet {} received.".format(reply[1]))
+                continue
+            future, settings, packet, _ = self._pending.pop(reply[1])
+
+            checkReply(reply)
+            self.serverState.acknowledge(settings, reply, {key: packet[4][key] for key in settings})
+            if not future.cancelled():
+                future.set_result(reply)
+
+    def emergencyStop(self) -> Future:
+        """
+        Stop the running acquisition on the server, all requests in flight are cancelled immediately.
+        Replies of the cancelled requests that still arrive are skipped, queued requests are not resubmitted.
+        @return:    Future of the stop reply
+        """
+        pending = list(self._pending.items())
+        self._pending.clear()
+        stopped = {idx for idx, _ in pending}
+        self._discarded.update(stopped)
+        self.serverState.clear()  # Unknown which settings were applied
+        cancelled = [entry[0] for _, entry in pending] + [entry[0] for entry in self._queued]
+        self._queued.clear()
+        for future in cancelled:
+            future.cancel()
+        print("Emergency stop, {} request(s) cancelled.".format(len(cancelled)))
+        future = self.request(construct_packet({}, command=emergency_stop_pkt))
+        # The server replies in order, the requests stopped here are answered before the stop reply.
+        # Only their indices are released, a later stop may still wait for its own
+        future.add_done_callback(lambda _: self._discarded.difference_update(stopped))
+        return future
+
+    @pyqtSlot()
+    def abortRequests(self) -> None:
+        """
+        Fail all pending requests and discard partially received replies.
+        Requests of a supervised connection are queued for resubmission after the reconnection instead.
+        @return:    None
+        """
+        pending = list(self._pending.values())
+        self._pending.clear()
+        self._discarded.clear()
+        self.serverState.clear()
+        for future, _, packet, delta in pending:
+            if future.done():
+                continue
+            if self._supervised and self.resubmittable(packet):
+                self._queued.append((future, packet, delta))
+            else:
+                future.set_exception(ConnectionError("Connection to server lost."))
+        self._receiver.reset()
+
+    def sendPacket(self, packet: list, timeout: int = None):
+        """
+        Send a packet and wait for the reply, UI events are processed while waiting
+        @param packet:  Packet fields [command, packetIdx, 0, version, payload]
+        @param timeout: Timeout in ms, wait until the reply or disconnection if None
+        @return:        Reply or None
+        """
+        future = self.request(packet)
+        if not future.done():
+            loop = QEventLoop()
+            future.add_done_callback(lambda _: loop.quit())
+            if timeout is not None:
+                QTimer.singleShot(timeout, loop.quit)
+            loop.exec_()
+        if future.done() and not future.cancelled() and future.exception() is None:
+            return future.result()
+        return None
 
     def setFrequency(self, freq: float) -> None:
         # TODO: Reimplement this function for new server
@@ -0,0 +1,409 @@
+"""
+Console Client
+
+@version:   1.0
+@change:    17/10/2026
+
+@summary:   Headless clients for the server protocol, without Qt, for scripts, protocol runners and
+            worker processes. ConsoleClient is blocking, AsyncConsoleClient uses asyncio.
+            Both use the packet construction of server_comms, match replies to requests by packet index,
+            read with large buffers and share the reply checks and server state mirror of the Qt client.
+            An emergency stop cancels the requests in flight, ConsoleClient.emergencyStop may be called from
+            another thread while a request blocks.
+            With reconnects > 0 ConsoleClient reestablishes a lost connection with exponential backoff,
+            restores the acknowledged settings and resubmits the unanswered requests.
+            Requests of protocol runs may be built from a packet template (see packettemplate), the static
+            settings of the operation are then sent with every request without serializing them again.
+
+            Example:
+                with ConsoleClient('10.42.0.100') as client:
+                    client.upload(operation)
+                    data = acquiredSamples(client.request({'acq': 50000}))
+
+@status:    Under testing
+@todo:
+
+"""
+
+import asyncio
+import socket
+import threading
+import time
+from concurrent.futures import CancelledError
+from warnings import warn
+import msgpack
+from server.receivebuffer import ReceiveBuffer
+from server.server_comms import construct_packet, request_pkt, emergency_stop_pkt
+from server.packettemplate import PacketTemplate
+from server.protocol import ServerState, actionCommands, propertyPayload, sequencePayload, checkReply
+
+defaultPort = 11111
+reconnectDelay = 0.5  # s, first reconnection attempt, doubled for every failed attempt
+maxReconnectDelay = 30.0  # s
+
+
+class ConsoleClient:
+    """
+    Blocking console client
+    """
+    def __init__(self, host: str = None, port: int = defaultPort, timeout: float = None, reconnects: int = 0):
+        """
+        Initialization of console client, connects if a host is given
+        @param host:        Address of the server
+        @param port:        Port of the server
+        @param timeout:     Socket timeout in s, None blocks until the reply
+        @param reconnects:  Reconnection attempts if the connection is lost during a request, 0 disables
+        """
+        self.timeout = timeout
+        self.reconnects = reconnects
+        self._address = None
+        self.serverState = ServerState()
+        self._sock = None
+        self._receiver = ReceiveBuffer()
+        self._replies: dict = {}  # Received replies by packet index, not yet collected
+        self._outstanding: set = set()  # Packet indices of requests without reply
+        self._stopped: set = set()  # Packet indices of requests cancelled by an emergency stop
+        self._stopIdx = None
+        self._packetIdx: int = 0
+        self._lock = threading.Lock()
+        if host is not None:
+            self.connect(host, port)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    @property
+    def connected(self) -> bool:
+        return self._sock is not None
+
+    def connect(self, host: str, port: int = defaultPort) -> None:
+        """
+        Connect to the server
+        @param host:    Address of the server
+        @param port:    Port of the server
+        @return:        None
+        """
+        self._open(host, port)
+        self._address = (host, port)
+        self.serverState.reset()
+
+    def _open(self, host: str, port: int) -> None:
+        self.close()
+        self._sock = socket.create_connection((host, port), timeout=self.timeout)
+        self._sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self._sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+        self._receiver.reset()
+        self._replies.clear()
+        self._outstanding.clear()
+        self._stopped.clear()
+        self._stopIdx = None
+        self.serverState.clear()
+
+    def reconnect(self) -> None:
+        """
+        Reestablish the connection with exponential backoff and restore the acknowledged settings
+        @return:    None
+        """
+        if self._address is None:
+            raise ConnectionError("Not connected to server.")
+        delay = reconnectDelay
+        for _ in range(max(self.reconnects, 1)):
+            time.sleep(delay)
+            delay = min(2 * delay, maxReconnectDelay)
+            try:
+                self._open(*self._address)
+                restore = self.serverState.restorePayload()
+                if restore:
+                    idx, payload = self.send(restore)
+                    self._acknowledge(self.receive(idx), payload)
+            except OSError:
+                self.close()
+                continue
+            warn("Connection to {}:{} restored.".format(*self._address))
+            return
+        raise ConnectionError("Reconnection to {}:{} failed.".format(*self._address))
+
+    def close(self) -> None:
+        """
+        Close the connection
+        @return:    None
+        """
+        if self._sock is not None:
+            self._sock.close()
+            self._sock = None
+
+    def send(self, payload: dict, command: int = request_pkt, delta: bool = False,
+             template: PacketTemplate = None) -> [int, dict]:
+        """
+        Send a request without waiting for the reply
+        @param payload:     Packet payload, only the varying fields if a template is given
+        @param command:     Packet type (request_pkt, emergency_stop_pkt, close_server_pkt), ignored with template
+        @param delta:       Send only settings that differ from the acknowledged server state, ignored with template
+        @param template:    Packet template with the static settings
+        @return:            Packet index and sent payload of the request
+        """
+        if self._sock is None:
+            raise ConnectionError("Not connected to server.")
+        if template is not None:
+            command = request_pkt
+        elif delta:
+            payload = self.serverState.delta(payload)
+        with self._lock:
+            self._packetIdx = (self._packetIdx + 1) & 0xffffffff
+            idx = self._packetIdx
+            if command == emergency_stop_pkt:
+                # Registered before sending, the receiving thread may read the stop reply right away
+                self._stopped.update(self._outstanding)
+                self._stopIdx = idx
+            self._outstanding.add(idx)
+            if template is None:
+                self._sock.sendall(msgpack.packb(construct_packet(payload, idx, command)))
+            else:
+                self._sock.sendall(template.build(idx, payload))
+        return idx, payload if template is None else template.payload(payload)
+
+    def receive(self, idx: int) -> list:
+        """
+        Wait for the reply of a request, replies of other requests are kept
+        @param idx: Packet index of the request
+        @return:    Reply
+        """
+        while True:
+            if self._stopIdx in self._replies and idx != self._stopIdx:
+                # Nobody waits for the stop reply, all stopped requests are answered before it
+                self._replies.pop(self._stopIdx)
+                self._outstanding.discard(self._stopIdx)
+                self._stopIdx = None
+                stopped = idx in self._stopped
+                self._purgeStopped()
+                if stopped:
+                    raise CancelledError("Request {} stopped.".format(idx))
+            if idx in self._stopped and idx in self._replies:
+                self._replies.pop(idx)
+                self._stopped.discard(idx)
+                self._outstanding.discard(idx)
+                raise CancelledError("Request {} stopped.".format(idx))
+            if idx in self._replies:
+                break
+            if not self._receiver.recv_into(self._sock):
+                self.close()
+                raise ConnectionError("Connection to server lost.")
+            for reply in self._receiver:
+                self._replies[reply[1]] = reply
+        self._outstanding.discard(idx)
+        self._stopped.discard(idx)
+        return self._replies.pop(idx)
+
+    def emergencyStop(self, wait: bool = True) -> [list, None]:
+        """
+        Stop the running acquisition, requests in flight are cancelled.
+        Call with wait=False from another thread while a request blocks, the request raises CancelledError.
+        @param wait:    Wait for the reply of the stop packet
+        @return:        Reply of the stop packet or None
+        """
+        self.serverState.clear()  # Unknown which settings were applied
+        idx, _ = self.send({}, emergency_stop_pkt)
+        if not wait:
+            return None
+        reply = self.receive(idx)
+        self._stopIdx = None
+        self._purgeStopped()
+        return reply
+
+    def _acknowledge(self, reply: list, payload: dict) -> None:
+        checkReply(reply)
+        self.serverState.acknowledge(ServerState.payloadSettings(payload), reply, payload)
+
+    def _purgeStopped(self) -> None:
+        # Late replies of stopped requests are not collected anymore
+        for stopped in self._stopped:
+            self._replies.pop(stopped, None)
+            self._outstanding.discard(stopped)
+        self._stopped.clear()
+
+    def request(self, payload: dict, command: int = request_pkt, delta: bool = False,
+                template: PacketTemplate = None) -> list:
+        """
+        Send a request and wait for the reply
+        @param payload:     Packet payload
+        @param command:     Packet type
+        @param delta:       Send only settings that differ from the acknowledged server state
+        @param template:    Packet template with the static settings
+        @return:            Reply [reply_pkt, packetIdx, 0, version, reply_data, status]
+        """
+        return self.requestMany([payload], command, delta, template)[0]
+
+    def requestMany(self, payloads: list, command: int = request_pkt, delta: bool = False,
+                    template: PacketTemplate = None) -> list:
+        """
+        Send several requests at once (pipelined) and wait for all replies.
+        Unanswered requests are resubmitted if the connection is lost and reconnects are enabled.
+        @param payloads:    Packet payloads
+        @param command:     Packet type
+        @param delta:       Send only settings that differ from the acknowledged server state
+        @param template:    Packet template with the static settings, payloads hold the varying fields
+        @return:            Replies in the order of the payloads
+        """
+        replies = []
+        remaining = list(payloads)
+        while remaining:
+            try:
+                sent = [self.send(payload, command, delta, template) for payload in remaining]
+                for idx, payload in sent:
+                    reply = self.receive(idx)
+                    self._acknowledge(reply, payload)
+                    replies.append(reply)
+                    remaining.pop(0)
+            except ConnectionError:
+                if not self.reconnects or command != request_pkt:
+                    raise
+                self.reconnect()
+        return replies
+
+    def upload(self, operation) -> [list, None]:
+        """
+        Upload sequence and settings of an operation, unchanged settings are skipped
+        @param operation:   Operation object
+        @return:            Reply or None if there was nothing to upload
+        """
+        payload = {**sequencePayload(operation), **propertyPayload(operation)}
+        payload = self.serverState.delta({key: value for key, value in payload.items() if key not in actionCommands})
+        return self.request(payload) if payload else None
+
+
+class AsyncConsoleClient:
+    """
+    Asyncio console client, any number of requests can be awaited concurrently
+    """
+    def __init__(self):
+        """
+        Initialization of asyncio console client
+        """
+        self.serverState = ServerState()
+        self._reader = None
+        self._writer = None
+        self._task = None
+        self._pending: dict = {}  # Future and mirrored settings of the requests in flight by packet index
+        self._discarded: set = set()  # Packet indices of stopped requests, their replies are skipped
+        self._packetIdx: int = 0
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        await self.close()
+
+    async def connect(self, host: str, port: int = defaultPort) -> None:
+        """
+        Connect to the server
+        @param host:    Address of the server
+        @param port:    Port of the server
+        @return:        None
+        """
+        await self.close()
+        self._reader, self._writer = await asyncio.open_connection(host, port, limit=1 << 20)
+        self.serverState.clear()
+        self._task = asyncio.ensure_future(self._readReplies())
+
+    async def close(self) -> None:
+        """
+        Close the connection, pending requests fail
+        @return:    None
+        """
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+        self._abort(ConnectionError("Connection closed."))
+
+    def _abort(self, exception: Exception) -> None:
+        pending = list(self._pending.values())
+        self._pending.clear()
+        for future, _ in pending:
+            if not future.done():
+                future.set_exception(exception)
+
+    async def _readReplies(self) -> None:
+        receiver = ReceiveBuffer()
+        try:
+            while True:
+                data = await self._reader.read(len(receiver))
+                if not data:
+                    break
+                receiver.feed(data)
+                for reply in receiver:
+                    if reply[1] not in self._pending:
+                        self._discarded.discard(reply[1])
+                        continue
+                    future, settings = self._pending.pop(reply[1])
+                    checkReply(reply)
+                    self.serverState.acknowledge(settings, reply)
+                    if not future.done():
+                        future.set_result(reply)
+        finally:
+            self.serverState.clear()
+            self._abort(ConnectionError("Connection to server lost."))
+
+    def send(self, payload: dict, command: int = request_pkt, delta: bool = False) -> asyncio.Future:
+        """
+        Send a request
+        @param payload: Packet payload
+        @param command: Packet type
+        @param delta:   Send only settings that differ from the acknowledged server state
+        @return:        Future of the reply
+        """
+        if self._writer is None:
+            raise ConnectionError("Not connected to server.")
+        if delta:
+            payload = self.serverState.delta(payload)
+        self._packetIdx = (self._packetIdx + 1) & 0xffffffff
+        future = asyncio.get_event_loop().create_future()
+        self._pending[self._packetIdx] = (future, ServerState.payloadSettings(payload))
+        self._writer.write(msgpack.packb(construct_packet(payload, self._packetIdx, command)))
+        return future
+
+    async def request(self, payload: dict, command: int = request_pkt, delta: bool = False) -> list:
+        """
+        Send a request and wait for the reply
+        @param payload: Packet payload
+        @param command: Packet type
+        @param delta:   Send only settings that differ from the server state
+        @return:        Reply [reply_pkt, packetIdx, 0, version, reply_data, status]
+        """
+        future = self.send(payload, command, delta)
+        await self._writer.drain()
+        return await future
+
+    async def upload(self, operation) -> [list, None]:
+        """
+        Upload sequence and settings of an operation, unchanged settings are skipped
+        @param operation:   Operation object
+        @return:            Reply or None if there was nothing to upload
+        """
+        payload = {**sequencePayload(operation), **propertyPayload(operation)}
+        payload = {key: value for key, value in payload.items() if key not in actionCommands}
+        payload = self.serverState.delta(payload)
+        return await self.request(payload) if payload else None
+
+    async def emergencyStop(self) -> list:
+        """
+        Stop the running acquisition, requests in flight are cancelled immediately
+        @return:    Reply of the stop packet
+        """
+        pending = list(self._pending.items())
+        self._pending.clear()
+        stopped = {idx for idx, _ in pending}
+        self._discarded.update(stopped)
+        self.serverState.clear()  # Unknown which settings were applied
+        for _, (future, _) in pending:
+            future.cancel()
+        try:
+            return await self.request({}, emergency_stop_pkt)
+        finally:
+            # The server replies in order, the requests stopped here are answered before the stop reply
+            self._discarded.difference_update(stopped)
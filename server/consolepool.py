@@ -0,0 +1,321 @@
+"""
+Console Pool
+
+@version:   1.0
+@change:    17/10/2026
+
+@summary:   Pool of named console connections and a dispatcher that runs operations and protocol steps
+            on the free consoles in parallel. Every console is served by a worker thread with a blocking
+            console client, a step runs on the first free console unless it is pinned to a console by name.
+            Sequence and settings are sent as delta, a console that ran the same operation before only
+            receives the acquisition command. Results of all consoles flow into one session in step order.
+            A console whose connection fails is retired, its unpinned steps are taken over by the others.
+
+            Example:
+                with ConsolePool({'rp1': '10.42.0.100', 'rp2': '10.42.0.101'}) as pool:
+                    session = Dispatcher(pool).run([operation] * 20)
+                    data = [acquiredSamples(result.reply) for result in session.results]
+
+@status:    Under testing
+@todo:
+
+"""
+
+import threading
+import time
+from concurrent.futures import Future, CancelledError, InvalidStateError, wait
+from warnings import warn
+from server.consoleclient import ConsoleClient, defaultPort
+from server.protocol import propertyPayload, sequencePayload
+
+
+class ConsolePool:
+    """
+    Named console connections
+    """
+    def __init__(self, consoles: dict = None, timeout: float = None, reconnects: int = 0):
+        """
+        Initialization of console pool, connects the given consoles
+        @param consoles:    Addresses by console name, 'host' or ('host', port)
+        @param timeout:     Socket timeout of the clients in s
+        @param reconnects:  Reconnection attempts of the clients
+        """
+        self.timeout = timeout
+        self.reconnects = reconnects
+        self.clients: dict = {}
+        for name, address in (consoles or {}).items():
+            host, port = (address, defaultPort) if isinstance(address, str) else address
+            self.add(name, host, port)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def __len__(self) -> int:
+        return len(self.clients)
+
+    def __getitem__(self, name: str) -> ConsoleClient:
+        return self.clients[name]
+
+    @property
+    def names(self) -> list:
+        return list(self.clients.keys())
+
+    def add(self, name: str, host: str, port: int = defaultPort) -> ConsoleClient:
+        """
+        Connect a console and add it to the pool
+        @param name:    Name of the console
+        @param host:    Address of the console
+        @param port:    Port of the console
+        @return:        Client of the console
+        """
+        if name in self.clients:
+            raise ValueError("Console {} already in pool.".format(name))
+        self.clients[name] = ConsoleClient(host, port, self.timeout, self.reconnects)
+        return self.clients[name]
+
+    def remove(self, name: str) -> None:
+        """
+        Disconnect a console and remove it from the pool
+        @param name:    Name of the console
+        @return:        None
+        """
+        self.clients.pop(name).close()
+
+    def close(self) -> None:
+        """
+        Disconnect all consoles
+        @return:    None
+        """
+        for client in self.clients.values():
+            client.close()
+        self.clients.clear()
+
+
+class StepResult:
+    """
+    Result of a dispatched step
+    """
+    def __init__(self, index: int, console: str, operation, reply: list, duration: float):
+        self.index = index  # Position of the step in the session
+        self.console = console  # Name of the console that ran the step
+        self.operation = operation
+        self.reply = reply
+        self.duration = duration  # Round trip in s
+
+
+class Session:
+    """
+    Results of the dispatched steps, ordered by step
+    """
+    def __init__(self):
+        self.results: list = []  # Step results, None until the step is done
+        self.callbacks: list = []  # Called with every step result, from the worker threads
+        self._lock = threading.Lock()
+
+    def reserve(self) -> int:
+        """
+        Reserve the position of a step
+        @return:    Index of the step
+        """
+        with self._lock:
+            self.results.append(None)
+            return len(self.results) - 1
+
+    def add(self, result: StepResult) -> None:
+        """
+        Add the result of a step
+        @param result:  Step result
+        @return:        None
+        """
+        with self._lock:
+            self.results[result.index] = result
+        for callback in self.callbacks:
+            callback(result)
+
+    @property
+    def done(self) -> int:
+        """
+        Number of completed steps
+        """
+        return len([result for result in self.results if result is not None])
+
+    def consoles(self) -> dict:
+        """
+        Number of completed steps by console
+        @return:    Steps by console name
+        """
+        counts: dict = {}
+        for result in self.results:
+            if result is not None:
+                counts[result.console] = counts.get(result.console, 0) + 1
+        return counts
+
+
+class Job:
+    """
+    Step waiting for a console
+    """
+    def __init__(self, index: int, operation, fields: dict, console: str):
+        self.index = index
+        self.operation = operation
+        self.fields = fields
+        self.console = console
+        self.future = Future()
+
+
+class Dispatcher:
+    """
+    Dispatcher of operations and protocol steps to the free consoles of a pool
+    """
+    def __init__(self, pool: ConsolePool, session: Session = None):
+        """
+        Initialization of dispatcher, starts a worker thread per console
+        @param pool:    Console pool
+        @param session: Session receiving the results, a new session if None
+        """
+        self.pool = pool
+        self.session = session or Session()
+        self._jobs: list = []
+        self._condition = threading.Condition()
+        self._closed: bool = False
+        self._workers: dict = {}
+        for name in pool.names:
+            self._workers[name] = threading.Thread(target=self._work, args=(name,), daemon=True)
+            self._workers[name].start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def submit(self, operation, fields: dict = None, console: str = None) -> Future:
+        """
+        Queue a step
+        @param operation:   Operation object, its sequence and settings are sent as delta
+        @param fields:      Additional payload fields, e.g. {'acq': samples} or changed settings
+        @param console:     Name of the console the step is pinned to, any free console if None
+        @return:            Future of the step result
+        """
+        if console is not None and console not in self._workers:
+            raise ValueError("Console {} not in pool.".format(console))
+        job = Job(self.session.reserve(), operation, fields or {}, console)
+        with self._condition:
+            if self._closed:
+                raise RuntimeError("Dispatcher closed.")
+            if not self._workers:
+                raise ConnectionError("No console available.")
+            self._jobs.append(job)
+            self._condition.notify_all()
+        return job.future
+
+    def run(self, steps: list) -> Session:
+        """
+        Run protocol steps and wait for all results, failed steps are reported and have no result
+        @param steps:   Operations or (operation, fields) or (operation, fields, console) tuples
+        @return:        Session with the results
+        """
+        futures = [self.submit(*step) if isinstance(step, tuple) else self.submit(step) for step in steps]
+        wait(futures)
+        failed = [future for future in futures if not future.cancelled() and future.exception() is not None]
+        if failed:
+            warn("{} of {} step(s) failed: {}".format(len(failed), len(futures), failed[0].exception()))
+        return self.session
+
+    def stop(self) -> None:
+        """
+        Emergency stop, queued steps are cancelled and the running acquisitions are stopped on all consoles
+        @return:    None
+        """
+        with self._condition:
+            jobs, self._jobs = self._jobs, []
+        for job in jobs:
+            job.future.cancel()
+        for name, client in self.pool.clients.items():
+            if client.connected:
+                try:
+                    client.emergencyStop(wait=False)
+                except OSError as error:
+                    warn("Emergency stop of console {} failed: {}".format(name, error))
+
+    def close(self) -> None:
+        """
+        Cancel queued steps and end the worker threads after their running step
+        @return:    None
+        """
+        with self._condition:
+            self._closed = True
+            jobs, self._jobs = self._jobs, []
+            self._condition.notify_all()
+        for job in jobs:
+            job.future.cancel()
+        for worker in self._workers.values():
+            worker.join()
+
+    def _next(self, name: str) -> [Job, None]:
+        with self._condition:
+            while True:
+                job = next((job for job in self._jobs if job.console in (None, name)), None)
+                if job is not None:
+                    self._jobs.remove(job)
+                    return job
+                if self._closed:
+                    return None
+                self._condition.wait()
+
+    def _work(self, name: str) -> None:
+        client = self.pool[name]
+        while True:
+            job = self._next(name)
+            if job is None:
+                return
+            if job.future.cancelled():
+                continue
+            t_start = time.perf_counter()
+            try:
+                payload = {**sequencePayload(job.operation), **propertyPayload(job.operation), **job.fields}
+                reply = client.request(payload, delta=True)
+            except CancelledError:
+                job.future.cancel()
+                continue
+            except OSError as error:
+                self._retire(name, job, error)
+                return
+            except Exception as error:
+                # The step failed, e.g. invalid sequence or reply, the console keeps serving the queue
+                self._resolve(job.future, exception=error)
+                continue
+            result = StepResult(job.index, name, job.operation, reply, time.perf_counter() - t_start)
+            self.session.add(result)
+            self._resolve(job.future, result)
+
+    @staticmethod
+    def _resolve(future: Future, result=None, exception: Exception = None) -> None:
+        # A step future may be cancelled by stop or close meanwhile
+        try:
+            if exception is not None:
+                future.set_exception(exception)
+            else:
+                future.set_result(result)
+        except InvalidStateError:
+            pass
+
+    def _retire(self, name: str, job: Job, error: Exception) -> None:
+        # The failed step and the unpinned queued steps are taken over by the remaining consoles
+        warn("Console {} retired: {}".format(name, error))
+        with self._condition:
+            del self._workers[name]
+            orphans = [queued for queued in self._jobs if queued.console == name or not self._workers]
+            self._jobs = [queued for queued in self._jobs if queued not in orphans]
+            if job.console is None and self._workers:
+                retry = Job(job.index, job.operation, job.fields, None)
+                retry.future = job.future
+                self._jobs.insert(0, retry)
+            else:
+                orphans.insert(0, job)
+            self._condition.notify_all()
+        for orphan in orphans:
+            self._resolve(orphan.future, exception=ConnectionError("Console {} failed: {}".format(name, error)))
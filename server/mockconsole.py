@@ -0,0 +1,307 @@
+"""
+Mock Console
+
+@version:   1.0
+@change:    17/10/2026
+
+@summary:   Local stand-in for the MaRCoS server on the RedPitaya, implemented with asyncio.
+            Speaks the msgpack protocol of server_comms ([command, packetIdx, 0, version, payload],
+            replies [reply_pkt, packetIdx, 0, version, reply_data, status]) and understands the keys of
+            Commands. 'acq' returns synthetic FID or spin echo data as complex64 bytes.
+            Latency, jitter and bandwidth of the link are configurable, with realtime=True an acquisition
+            lasts as long as the uploaded sequence (static timing analysis).
+            Run from the project root: python -m server.mockconsole [--port 11111] [--signal se] ...
+
+@status:    Under testing
+@todo:
+
+"""
+
+import argparse
+import asyncio
+import random
+import threading
+import msgpack
+import numpy as np
+from server.server_comms import request_pkt, emergency_stop_pkt, close_server_pkt, reply_pkt
+from timinganalyzer import analyze, rxSampleTime
+
+defaultPort = 11111
+pulseMemoryWords = 200  # 32 bit words, see sequenceoptimizer
+fpgaClock = 125.0  # MHz
+
+settingKeys = ('fpga_clk', 'lo_freq', 'tx_div', 'rf_amp', 'rx_rate', 'tx_size', 'tx_samples',
+               'grad_offs_x', 'grad_offs_y', 'grad_offs_z', 'grad_mem_x', 'grad_mem_y', 'grad_mem_z',
+               'raw_tx_data', 'seq_data')
+
+
+class MockConsole:
+    """
+    Mock console class
+    """
+    def __init__(self,
+                 host: str = '127.0.0.1',
+                 port: int = defaultPort,
+                 signal: str = 'fid',
+                 larmor: float = 11.2953,
+                 t2: float = 5.0,
+                 noise: float = 0.01,
+                 latency: float = 0.0,
+                 jitter: float = 0.0,
+                 bandwidth: float = None,
+                 realtime: bool = False,
+                 seed: int = None):
+        """
+        Initialization of mock console
+        @param host:        Host address to listen on
+        @param port:        Port to listen on, 0 selects a free port
+        @param signal:      Synthetic signal: 'fid', 'se' or 'noise'
+        @param larmor:      Larmor frequency of the synthetic sample in MHz
+        @param t2:          Decay time of the synthetic signal in ms
+        @param noise:       Standard deviation of the noise relative to the signal amplitude
+        @param latency:     Delay before every reply in s
+        @param jitter:      Maximum random deviation of the delay in s
+        @param bandwidth:   Link bandwidth in bytes/s, unlimited if None
+        @param realtime:    Acquisitions last as long as the uploaded sequence
+        @param seed:        Seed of noise and jitter
+        """
+        self.host = host
+        self.port = port
+        self.signal = signal
+        self.larmor = larmor
+        self.t2 = t2
+        self.noise = noise
+        self.latency = latency
+        self.jitter = jitter
+        self.bandwidth = bandwidth
+        self.realtime = realtime
+        self.rng = np.random.default_rng(seed)
+        self.random = random.Random(seed)
+        self.requests: int = 0
+        self._server = None
+
+    async def start(self) -> None:
+        """
+        Start listening, the selected port is stored in self.port
+        @return:    None
+        """
+        self._server = await asyncio.start_server(self.handle, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+
+    async def close(self) -> None:
+        """
+        Stop listening
+        @return:    None
+        """
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    async def serve(self) -> None:
+        """
+        Start and serve until cancelled
+        @return:    None
+        """
+        await self.start()
+        print("Mock console listening on {}:{}".format(self.host, self.port))
+        async with self._server:
+            await self._server.serve_forever()
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        """
+        Connection handler, packets are processed in order by a worker task,
+        an emergency stop cancels the running and queued requests
+        @param reader:  Stream reader of the connection
+        @param writer:  Stream writer of the connection
+        @return:        None
+        """
+        state: dict = {}
+        queue: asyncio.Queue = asyncio.Queue()
+        worker = asyncio.ensure_future(self.work(queue, state, writer))
+        unpacker = msgpack.Unpacker()
+        try:
+            while True:
+                data = await reader.read(1 << 16)
+                if not data:
+                    break
+                unpacker.feed(data)
+                for packet in unpacker:
+                    if packet[0] == close_server_pkt:
+                        return
+                    if packet[0] == emergency_stop_pkt:
+                        worker.cancel()
+                        try:
+                            await worker
+                        except asyncio.CancelledError:
+                            pass
+                        stopped = [item for item in self.drain(queue)]
+                        running = state.pop('running', None)
+                        sending = state.pop('sending', None)
+                        if sending is not None:
+                            await sending  # Reply of the running packet is written completely
+                        elif running is not None:
+                            stopped.insert(0, running)
+                        for item in stopped:
+                            await self.send(writer, self.reply(item, {}, {'errors': ["acquisition stopped"]}))
+                        await self.send(writer, self.reply(packet, {}, {'infos': ["emergency stop"]}))
+                        worker = asyncio.ensure_future(self.work(queue, state, writer))
+                        continue
+                    await queue.put(packet)
+        except (ConnectionError, msgpack.UnpackException):
+            pass
+        finally:
+            worker.cancel()
+            writer.close()
+
+    @staticmethod
+    def drain(queue: asyncio.Queue) -> list:
+        items = []
+        while not queue.empty():
+            items.append(queue.get_nowait())
+        return items
+
+    async def work(self, queue: asyncio.Queue, state: dict, writer: asyncio.StreamWriter) -> None:
+        """
+        Process the queued packets of a connection. A packet stays running until its reply is written,
+        the write of a reply is not interrupted by an emergency stop (no partial frames).
+        """
+        while True:
+            packet = await queue.get()
+            state['running'] = packet
+            reply_data, status = self.process(packet, state)
+            if self.realtime and 'acq' in packet[4] and 'seq_data' in state:
+                await asyncio.sleep(analyze(bytes(state['seq_data'])).duration * 1e-6)
+            state['sending'] = asyncio.ensure_future(self.send(writer, self.reply(packet, reply_data, status)))
+            # A write failing after the worker was cancelled (connection closed) is not reported as unretrieved
+            state['sending'].add_done_callback(lambda sending: sending.cancelled() or sending.exception())
+            await asyncio.shield(state['sending'])
+            state.pop('sending', None)
+            state.pop('running', None)
+
+    def reply(self, packet: list, reply_data: dict, status: dict) -> list:
+        return [reply_pkt, packet[1], 0, packet[3], reply_data, status]
+
+    def process(self, packet: list, state: dict) -> [dict, dict]:
+        """
+        Process a request packet
+        @param packet:  Packet fields
+        @param state:   Settings of the connection
+        @return:        Reply data and status
+        """
+        self.requests += 1
+        reply_data: dict = {}
+        status: dict = {'errors': [], 'warnings': [], 'infos': []}
+        if packet[0] != request_pkt or not isinstance(packet[4], dict):
+            status['errors'].append("Unknown packet type {}".format(packet[0]))
+            return reply_data, status
+
+        for key, value in packet[4].items():
+            if key in settingKeys:
+                state[key] = value
+                reply_data[key] = 0
+                if key == 'seq_data' and len(value) > 4 * pulseMemoryWords:
+                    status['warnings'].append("Sequence of {} bytes truncated to {} words"
+                                              .format(len(value), pulseMemoryWords))
+            elif key == 'recomp_pul':
+                reply_data[key] = 0
+            elif key == 'acq':
+                if 'seq_data' not in state:
+                    status['errors'].append("No sequence uploaded")
+                    continue
+                reply_data[key] = self.acquire(state, int(value))
+                status['infos'].append("Acquired {} samples".format(int(value)))
+            elif key == 'test_throughput':
+                array = np.arange(int(value), dtype=float)
+                reply_data[key] = {'array1': array.tolist(), 'array2': (array + 1).tolist()}
+            else:
+                status['errors'].append("Unknown request key {}".format(key))
+        return reply_data, {key: value for key, value in status.items() if value}
+
+    def acquire(self, state: dict, samples: int) -> bytes:
+        """
+        Synthetic acquisition data
+        @param state:   Settings of the connection
+        @param samples: Number of samples
+        @return:        Samples as complex64 bytes
+        """
+        t = np.arange(samples) * rxSampleTime * 1e-3  # ms
+        lo_freq = state.get('lo_freq', 0) / (1 << 30) * fpgaClock
+        offset = (self.larmor - lo_freq) * 1e3  # kHz
+        if self.signal == 'se':
+            echo = t[-1] / 4 if samples else 0
+            envelope = np.exp(-np.abs(t - echo) / self.t2)
+        elif self.signal == 'noise':
+            envelope = np.zeros(samples)
+        else:
+            envelope = np.exp(-t / self.t2)
+        data = envelope * np.exp(2j * np.pi * offset * t)
+        data = data + self.noise * (self.rng.standard_normal(samples) + 1j * self.rng.standard_normal(samples))
+        return data.astype(np.complex64).tobytes()
+
+    async def send(self, writer: asyncio.StreamWriter, reply: list) -> None:
+        """
+        Send a reply with the configured latency, jitter and bandwidth
+        @param writer:  Stream writer of the connection
+        @param reply:   Reply fields
+        @return:        None
+        """
+        data = msgpack.packb(reply)
+        delay = self.latency + self.random.uniform(-self.jitter, self.jitter)
+        if delay > 0:
+            await asyncio.sleep(delay)
+        if self.bandwidth is None:
+            writer.write(data)
+        else:
+            chunk = max(1024, int(self.bandwidth / 100))
+            for start in range(0, len(data), chunk):
+                writer.write(data[start:start + chunk])
+                await asyncio.sleep(min(chunk, len(data) - start) / self.bandwidth)
+        await writer.drain()
+
+
+def startInThread(**kwargs) -> MockConsole:
+    """
+    Start a mock console in a background thread, e.g. for benchmarks and scripts
+    @param kwargs:  Arguments of MockConsole, port 0 selects a free port
+    @return:        Running mock console
+    """
+    kwargs.setdefault('port', 0)
+    console = MockConsole(**kwargs)
+    loop = asyncio.new_event_loop()
+    started = threading.Event()
+    failed: list = []  # Exception of a failed start, e.g. port in use
+
+    def run():
+        asyncio.set_event_loop(loop)
+        try:
+            loop.run_until_complete(console.start())
+        except Exception as error:
+            failed.append(error)
+            loop.close()
+            return
+        finally:
+            started.set()
+        loop.run_forever()
+
+    threading.Thread(target=run, daemon=True).start()
+    started.wait()
+    if failed:
+        raise failed[0]
+    return console
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Mock console for the MaRCoS msgpack protocol")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=defaultPort)
+    parser.add_argument('--signal', choices=['fid', 'se', 'noise'], default='fid')
+    parser.add_argument('--latency', type=float, default=0.0, help="reply delay in s")
+    parser.add_argument('--jitter', type=float, default=0.0, help="random delay deviation in s")
+    parser.add_argument('--bandwidth', type=float, default=None, help="link bandwidth in bytes/s")
+    parser.add_argument('--realtime', action='store_true', help="acquisitions last as long as the sequence")
+    args = parser.parse_args()
+    try:
+        asyncio.run(MockConsole(**vars(args)).serve())
+    except KeyboardInterrupt:
+        pass
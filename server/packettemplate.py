@@ -0,0 +1,136 @@
+"""
+Packet Template
+
+@version:   1.0
+@change:    17/10/2026
+
+@summary:   Precomputed serialization of request packets. The static settings of an operation (sequence,
+            frequency, ...) are serialized once, a packet is built by splicing the packet index and the
+            varying fields (e.g. 'acq') into the cached bytes. The result is byte-identical to
+            msgpack.packb(construct_packet({**static, **fields}, packetIdx)), fields that override a static
+            setting are moved to the end of the payload.
+            Templates of operations are cached. The cache key is the assembled sequence and the raw values of
+            the system properties, an operation is only serialized again after one of them changed.
+
+            Example:
+                template = operationTemplate(operation)
+                sock.sendall(template.build(packetIdx, {'acq': 50000}))
+
+@status:    Under testing
+@todo:
+
+"""
+
+import struct
+import threading
+import msgpack
+from operationsnamespace import Namespace as nmspc
+from server.server_comms import construct_packet, request_pkt
+from server.protocol import actionCommands, propertyPayload, sequencePayload
+
+_local = threading.local()  # Packer per thread, a packer is not thread-safe
+
+
+def packer() -> msgpack.Packer:
+    """
+    Packer of the calling thread, saves the setup of a packer per packb call
+    @return:    Packer
+    """
+    if not hasattr(_local, 'packer'):
+        _local.packer = msgpack.Packer()
+    return _local.packer
+
+
+def mapHeader(size: int) -> bytes:
+    """
+    Serialized header of a msgpack map
+    @param size:    Number of key/value pairs
+    @return:        Header bytes
+    """
+    if size < 16:
+        return bytes([0x80 | size])
+    if size < 1 << 16:
+        return b'\xde' + struct.pack('>H', size)
+    return b'\xdf' + struct.pack('>I', size)
+
+
+class PacketTemplate:
+    """
+    Request packet with serialized static payload
+    """
+    def __init__(self, static: dict, command: int = request_pkt):
+        """
+        Initialization of packet template, serializes the static payload
+        @param static:  Static settings of the payload
+        @param command: Packet type
+        """
+        self.static = dict(static)
+        fields = construct_packet(None, 0, command)
+        self._head = b'\x95' + msgpack.packb(fields[0])  # Array of 5 fields, command
+        self._version = msgpack.packb(fields[2]) + msgpack.packb(fields[3])
+        self._pairs = {key: msgpack.packb(key) + msgpack.packb(value) for key, value in self.static.items()}
+        self._body = b''.join(self._pairs.values())
+        # Version and map header by number of varying fields
+        self._headers = [self._version + mapHeader(len(self._pairs) + size) for size in range(16)]
+
+    def build(self, packetIdx: int, fields: dict = None) -> bytes:
+        """
+        Serialized packet with the static payload and the varying fields
+        @param packetIdx:   Packet index
+        @param fields:      Varying fields of the payload, override static settings with the same key
+        @return:            Packet bytes
+        """
+        pack = packer().pack
+        if not fields:
+            return b''.join((self._head, pack(packetIdx), self._headers[0], self._body))
+        # The varying fields are serialized in one call, their own map header is dropped
+        if len(fields) < 16 and self._pairs.keys().isdisjoint(fields):
+            return b''.join((self._head, pack(packetIdx), self._headers[len(fields)], self._body,
+                             pack(fields)[1:]))
+        pairs = [pair for key, pair in self._pairs.items() if key not in fields]
+        tail = pack(fields)[len(mapHeader(len(fields))):]
+        return b''.join([self._head, pack(packetIdx), self._version,
+                         mapHeader(len(pairs) + len(fields))] + pairs + [tail])
+
+    def payload(self, fields: dict = None) -> dict:
+        """
+        Payload of a packet built with the given fields
+        @param fields:  Varying fields of the payload
+        @return:        Payload
+        """
+        return {**self.static, **(fields or {})}
+
+
+templates: dict = {}  # (sequence, settings, template) by operation id
+
+
+def operationKey(operation) -> tuple:
+    """
+    Cache key of an operation's payload: the assembled sequence and the raw values of the system properties.
+    The payload is a function of both, the assembled sequence is replaced (not modified) on every change.
+    @param operation:   Operation object
+    @return:            Sequence bytestream and settings
+    """
+    sequence = operation.pulsesequence.get(nmspc.sequence, (None, None))[1] \
+        if hasattr(operation, 'pulsesequence') else None
+    settings = tuple(prop[0] for prop in operation.systemproperties.values()) \
+        if hasattr(operation, 'systemproperties') else ()
+    return sequence, settings
+
+
+def operationTemplate(operation) -> PacketTemplate:
+    """
+    Packet template of the sequence and settings of an operation, cached per operation.
+    The template is rebuilt if the sequence or a setting of the operation changed.
+    @param operation:   Operation object
+    @return:            Packet template
+    """
+    sequence, settings = operationKey(operation)
+    cached = templates.get(id(operation))
+    # The cached template keeps its sequence alive, the identity check can not match a new bytestream
+    if cached is not None and cached[0] is sequence and cached[1] == settings:
+        return cached[2]
+    static = {**sequencePayload(operation), **propertyPayload(operation)}
+    template = PacketTemplate({key: value for key, value in static.items() if key not in actionCommands})
+    templates[id(operation)] = (sequence, settings, template)
+    return template
@@ -0,0 +1,209 @@
+"""
+Protocol
+
+@version:   1.0
+@change:    17/10/2026
+
+@summary:   Qt-free parts of the server protocol, shared by the Qt communication manager and the headless
+            console client: command keys, payload construction from operations, reply checks and the
+            mirror of the acknowledged server settings.
+
+@status:    Under testing
+@todo:
+
+"""
+
+import hashlib
+from warnings import warn
+import numpy as np
+from operationsnamespace import Namespace as nmspc
+from server.server_comms import version_major
+
+fpga_clk = 125.0
+
+
+class Commands:
+    """
+    Commands Class for Marcos-Server
+    """
+    fpgaClock = 'fpga_clk' # array of 3 values unsigned int (clock words)
+    localOscillatorFrequency = 'lo_freq' # unsigned int (local oscillator freq. for TX/RX)
+    txClockDivider = 'tx_div' # unsigned int (clock divider for RF TX samples)
+    rfAmplitude = 'rf_amp' # unsigned int 16 bit (RF amplitude)
+    rxRate = 'rx_rate' # unsigned int 16 bit (tx sample rate???)
+    txSampleSize = 'tx_size' # unsigned int 16 bit (number of TX samples to return)
+    txSamplesPerPulse = 'tx_samples' # unsigned int (number of TX samples per pulse)
+    gradientOffsetX = 'grad_offs_x' # unsigned int (X gradient channel shim)
+    gradientOffsetY = 'grad_offs_y' # unsigned int (Y gradient channel shim)
+    gradientOffsetZ = 'grad_offs_z' # unsigned int (Z gradient channel shim)
+    gradientMemoryX = 'grad_mem_x' # binary byte array (write X gradient channel memory)
+    gradientMemoryY = 'grad_mem_y' # binary byte array (write Y gradient channel memory)
+    gradientMemoryZ = 'grad_mem_z' # binary byte array (write Z gradient channel memory)
+    recomputeTxPulses = 'recomp_pul' # boolean (recompute the TX pulses)
+    txRfWaveform = 'raw_tx_data' # binary byte array (write the RF waveform)
+    sequenceData = 'seq_data' # binary byte array (pulse sequence instructions)
+    runAcquisition = 'acq' # unsigned int [samples] (runs 'seq_data' and returns array of 64-bit complex floats, length = samples)
+    testRxThroughput = 'test_throughput' # unsigned int [arg] (return array map, array-length = arg)
+    requestPacket = 0
+
+# Commands that trigger an action on the server instead of changing a setting, always sent
+actionCommands = (Commands.runAcquisition, Commands.testRxThroughput, Commands.recomputeTxPulses)
+
+# TODO: Create a config file for the following
+fpga_clk_frequency_MHz = 125
+
+
+def propertyPayload(operation) -> dict:
+    """
+    Construct the payload of the system properties of an operation
+    @param operation:   Operation object
+    @return:            Payload
+    """
+    packet: dict = {}
+
+    if hasattr(operation, 'systemproperties'):
+        sys_prop = operation.systemproperties
+        for key in list(sys_prop.keys()):
+            if len(sys_prop[key]) == 3:
+                if key == nmspc.frequency:
+                    # TODO: Find alternative way for this ?
+                    packet[sys_prop[key][2]] = int(np.round(sys_prop[key][0] /
+                                                            fpga_clk_frequency_MHz * (1 << 30))) & 0xfffffff0 | 0xf
+                    continue
+                packet[sys_prop[key][2]] = sys_prop[key][0]
+
+    # TODO: Integrate gradient offsets in gradient waveform (maybe leave it for spectroscopy)
+    """
+    if hasattr(operation, 'gradientshims'):
+        shim = operation.gradientshims
+        packet[Commands.gradientOffsetX] = shim[nmspc.x_grad][0]
+        packet[Commands.gradientOffsetY] = shim[nmspc.y_grad][0]
+        packet[Commands.gradientOffsetZ] = shim[nmspc.z_grad][0]
+    """
+    return packet
+
+
+def sequencePayload(operation) -> dict:
+    """
+    Construct the payload of the sequence of an operation
+    @param operation:   Operation object
+    @return:            Payload
+    """
+    package: dict = {}
+
+    if hasattr(operation, 'pulsesequence') and len(operation.pulsesequence) > 1:
+        seq = operation.pulsesequence
+        package[Commands.sequenceData] = seq[nmspc.sequence][1]
+    else:
+        warn("ERROR: No sequence bytestream!")
+
+    return package
+
+
+def replyErrors(reply: list) -> list:
+    """
+    Get the errors reported in the status of a reply
+    @param reply:   Reply [reply_pkt, packetIdx, 0, version, reply_data, status]
+    @return:        Error messages
+    """
+    if len(reply) > 5 and isinstance(reply[5], dict):
+        return list(reply[5].get('errors', []))
+    return []
+
+
+def checkReply(reply: list) -> bool:
+    """
+    Report errors, warnings and a version mismatch of a reply
+    @param reply:   Reply [reply_pkt, packetIdx, 0, version, reply_data, status]
+    @return:        Reply without errors (true/false)
+    """
+    if reply[3] >> 16 != version_major:
+        warn("Server version {} differs from client version {}.".format(reply[3] >> 16, version_major))
+    errors = replyErrors(reply)
+    if errors:
+        warn("Server errors: {}".format(errors))
+    if len(reply) > 5 and isinstance(reply[5], dict) and reply[5].get('warnings'):
+        warn("Server warnings: {}".format(reply[5]['warnings']))
+    return not errors
+
+
+class ServerState:
+    """
+    Mirror of the settings acknowledged by the server, binary settings (sequence, gradient and RF memory)
+    are mirrored by digest. The acknowledged values are kept to restore the server state after a reconnection.
+    """
+    def __init__(self):
+        self.settings: dict = {}
+        self.restore: dict = {}  # Acknowledged values of the session, survive clear()
+        self.bytesSaved: int = 0  # Upload bytes saved by the mirror
+
+    @staticmethod
+    def value(value):
+        """
+        Get the mirrored value of a setting, binary data is represented by its digest
+        @param value:   Value of the setting
+        @return:        Value or digest
+        """
+        if isinstance(value, (bytes, bytearray, memoryview)):
+            return 'sha1', hashlib.sha1(value).digest()
+        return value
+
+    @classmethod
+    def payloadSettings(cls, payload: dict) -> dict:
+        """
+        Get the mirrored values of the settings in a payload
+        @param payload: Packet payload
+        @return:        Mirrored settings
+        """
+        return {key: cls.value(value) for key, value in payload.items() if key not in actionCommands}
+
+    def delta(self, payload: dict) -> dict:
+        """
+        Remove settings from a payload that the server already acknowledged.
+        Settings of requests in flight are sent again, the earlier request may still fail.
+        @param payload: Packet payload
+        @return:        Payload with actions and changed settings
+        """
+        state = self.settings
+        delta = {key: value for key, value in payload.items()
+                 if key in actionCommands or key not in state or state[key] != self.value(value)}
+        self.bytesSaved += sum([len(value) for key, value in payload.items()
+                                if key not in delta and isinstance(value, (bytes, bytearray, memoryview))])
+        return delta
+
+    def acknowledge(self, settings: dict, reply: list, payload: dict = None) -> None:
+        """
+        Update the mirror with the settings of an answered request
+        @param settings:    Mirrored settings of the request
+        @param reply:       Reply of the request
+        @param payload:     Sent payload, its settings are kept for restoring if given
+        @return:            None
+        """
+        if replyErrors(reply):
+            self.settings.clear()  # Unknown which settings were applied
+        else:
+            self.settings.update(settings)
+            if payload is not None:
+                self.restore.update({key: value for key, value in payload.items() if key not in actionCommands})
+
+    def restorePayload(self) -> dict:
+        """
+        Payload that restores the acknowledged settings of the session, e.g. after a reconnection
+        @return:    Payload
+        """
+        return dict(self.restore)
+
+    def clear(self) -> None:
+        """
+        Invalidate the mirror, e.g. on (re)connection
+        @return:    None
+        """
+        self.settings.clear()
+
+    def reset(self) -> None:
+        """
+        Invalidate the mirror and forget the settings of the session, e.g. on connection to a server
+        @return:    None
+        """
+        self.settings.clear()
+        self.restore.clear()
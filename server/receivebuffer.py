@@ -0,0 +1,88 @@
+"""
+Receive Buffer
+
+@version:   1.0
+@change:    17/10/2026
+
+@summary:   Bulk receive path for server replies. Socket data is read into a preallocated bytearray,
+            which grows while reads fill it completely, and fed to the msgpack unpacker as memoryview.
+            Acquired data is returned as numpy view on the decoded reply without further copies.
+
+@status:    Under testing
+@todo:
+
+"""
+
+import msgpack
+import numpy as np
+
+defaultSize = 1 << 16
+maxSize = 1 << 24
+
+
+class ReceiveBuffer:
+    """
+    Receive buffer class
+    """
+    def __init__(self, size: int = defaultSize, max_size: int = maxSize):
+        """
+        Initialization of receive buffer
+        @param size:        Initial size of the buffer in bytes
+        @param max_size:    Maximum size of the buffer in bytes
+        """
+        self.max_size = max_size
+        self.received: int = 0
+        self._buffer = bytearray(size)
+        self._view = memoryview(self._buffer)
+        self.unpacker = msgpack.Unpacker()
+
+    def __len__(self) -> int:
+        return len(self._buffer)
+
+    def __iter__(self):
+        """
+        Iterate over the completely received replies
+        """
+        return iter(self.unpacker)
+
+    def recv_into(self, sock) -> int:
+        """
+        Read all data available in one call from a socket
+        @param sock:    Connected socket
+        @return:        Number of received bytes, 0 if the connection was closed
+        """
+        n_bytes = sock.recv_into(self._view)
+        if n_bytes:
+            self.unpacker.feed(self._view[:n_bytes])
+            self.received += n_bytes
+            # A full read indicates more pending data, read larger blocks next time
+            if n_bytes == len(self._buffer) and len(self._buffer) < self.max_size:
+                self._buffer = bytearray(min(2 * len(self._buffer), self.max_size))
+                self._view = memoryview(self._buffer)
+        return n_bytes
+
+    def feed(self, data) -> None:
+        """
+        Feed data read by other means, e.g. QTcpSocket.readAll
+        @param data:    Received bytes or buffer
+        @return:        None
+        """
+        self.unpacker.feed(data)
+        self.received += len(data)
+
+    def reset(self) -> None:
+        """
+        Discard partially received replies, e.g. after reconnection
+        @return:    None
+        """
+        self.unpacker = msgpack.Unpacker()
+
+
+def acquiredSamples(reply: list, key: str = 'acq') -> np.ndarray:
+    """
+    Get the acquired samples of a reply
+    @param reply:   Reply [reply_pkt, packetIdx, 0, version, reply_data, status]
+    @param key:     Key of the data in the reply
+    @return:        Complex samples as view on the reply data
+    """
+    return np.frombuffer(reply[4][key], np.complex64)
@@ -57,8 +57,7 @@ def process(payload, print_all=False):
         print(reply_data)
 
 def send_packet(packet, socket):
-    # socket.sendall(msgpack.packb(packet))
-    socket.write(msgpack.packb(packet))
+    socket.sendall(msgpack.packb(packet))
 
     unpacker = msgpack.Unpacker()
     packet_done = False
@@ -0,0 +1,88 @@
+"""
+Spectral Metrics
+
+@version:   1.0
+@change:    17/10/2026
+
+@summary:   Quality metrics of an acquired spectrum in one vectorized routine: evaluability, peak,
+            full width at half maximum (points, Hz, ppm) and signal to noise ratio.
+            The magnitude spectrum is scanned once for peak and evaluability, FWHM and SNR only use the
+            peak window and the noise floor. Results equal the former DataManager methods
+            get_peakparameters, get_fwhm, get_snr and is_evaluateable.
+
+@status:    Under testing
+@todo:      Return snr in dB too
+
+"""
+
+from dataclasses import dataclass
+import numpy as np
+
+nan = float("nan")
+
+
+@dataclass
+class SpectralMetrics:
+    """
+    Result of the spectral metrics
+    """
+    evaluable: bool = False  # Spectrum shows a signal (peak-to-peak magnitude > 1)
+    peakValue: float = nan  # Maximum of the magnitude spectrum
+    peakIdx: int = 0  # Index of the spectral peak
+    peakFrequency: float = nan  # Frequency of the spectral peak in MHz
+    timePeakValue: float = nan  # Maximum of the smoothed time domain magnitude
+    fwhm: int = 0  # Full width at half maximum in datapoints
+    fwhmHz: float = nan  # Full width at half maximum in Hz
+    fwhmPpm: float = nan  # Full width at half maximum in ppm
+    snr: float = nan  # Signal to noise ratio
+
+
+def spectralMetrics(f_fftData: np.ndarray,
+                    f_fftMagnitude: np.ndarray,
+                    t_magnitudeCon: np.ndarray,
+                    frequency: float,
+                    f_range: float,
+                    f_fwhmWindow: int = 1000,
+                    f_windowfactor: float = 10) -> SpectralMetrics:
+    """
+    Compute the quality metrics of a spectrum
+    @param f_fftData:       Shifted complex spectrum
+    @param f_fftMagnitude:  Magnitude of the spectrum
+    @param t_magnitudeCon:  Smoothed time domain magnitude
+    @param frequency:       Center frequency in MHz
+    @param f_range:         Range of the frequency spectrum in Hz
+    @param f_fwhmWindow:    Frequency window of the FWHM in datapoints
+    @param f_windowfactor:  Factor for fwhm to define the peak window excluded from the noise
+    @return:                Spectral metrics
+    """
+    samples = len(f_fftMagnitude)
+    peakIdx = int(np.argmax(f_fftMagnitude))
+    maxValue = f_fftMagnitude[peakIdx]
+    if not maxValue - f_fftMagnitude.min() > 1:
+        return SpectralMetrics()
+
+    metrics = SpectralMetrics(evaluable=True, peakIdx=peakIdx)
+    metrics.peakValue = round(maxValue, 4)
+    metrics.timePeakValue = round(np.max(t_magnitudeCon), 4)
+    metrics.peakFrequency = round(frequency + ((peakIdx - samples / 2) * f_range / samples) / 1.0e6, 6)
+
+    # Minima of the distance to half maximum left and right of the peak
+    window = f_fftMagnitude[int(peakIdx - f_fwhmWindow / 2):int(peakIdx + f_fwhmWindow / 2)]
+    candidates = np.abs(window - metrics.peakValue / 2)
+    winC = int(f_fwhmWindow / 2)
+    if len(candidates[winC:-1]) and len(candidates[0:winC]):  # Empty if the window exceeds the spectrum
+        metrics.fwhm = np.argmin(candidates[winC:-1]) + winC - np.argmin(candidates[0:winC])
+        metrics.fwhmHz = metrics.fwhm * f_range / samples
+        metrics.fwhmPpm = metrics.fwhmHz / metrics.peakFrequency
+
+    # Noise floor outside of the peak window and the borders of the spectrum
+    peakWin = int(metrics.fwhm * f_windowfactor)
+    winC = int(samples / 2)
+    noiseBorder = int(samples * 0.05)
+    noiseFloor = np.concatenate((f_fftData[noiseBorder:int(winC - peakWin / 2)],
+                                 f_fftData[int(winC + peakWin / 2):-1 - noiseBorder]))
+    noise = np.std(noiseFloor / metrics.peakValue) if len(noiseFloor) else nan
+    if noise > 0:
+        metrics.snr = round(1 / noise)
+
+    return metrics
@@ -0,0 +1,134 @@
+"""
+Timing Analyzer
+
+@version:   1.0
+@change:    17/10/2026
+
+@summary:   Static timing analysis of assembled pulse programs.
+            Executes the control flow of a program (J, LD64, DEC, INC, JNZ, PR, HALT) without hardware
+            and derives the sequence duration, the receiver windows and the number of RX samples.
+
+@status:    Under testing
+@todo:      Add gradient windows
+
+"""
+
+from dataclasses import dataclass
+from functools import lru_cache
+from assembler import conversion_factor
+from disassembler import disassemble
+
+# Opcodes, see Assembler.opcode_table
+NOP = 0b000000
+DEC = 0b000001
+INC = 0b000010
+LD64 = 0b000100
+TXOFFSET = 0b001000
+GRADOFFSET = 0b001001
+JNZ = 0b010000
+J = 0b010111
+HALT = 0b011001
+PR = 0b011101
+
+RX_PULSE = 0x02  # Inverted logic: receiver acquires while the bit is cleared, setting it resets the RX FIFO
+clockCycle = 1 / conversion_factor  # Duration of one clock cycle in us
+rxSampleTime = 4.0  # Duration of one RX sample in us
+maxSteps = 1000000
+
+
+@dataclass(frozen=True)
+class SequenceTiming:
+    """
+    Result of the timing analysis, times in us. Immutable, analyze() shares cached results between callers.
+    """
+    duration: float = 0  # Total duration of the sequence
+    cycles: int = 0  # Total duration in clock cycles
+    instructions: int = 0  # Number of executed instructions
+    rx_windows: tuple = ()  # Receiver windows as (start, stop)
+    rx_samples: int = 0  # Samples acquired since the last RX FIFO reset, rounded to whole samples
+
+    def check_samples(self, samples: int) -> bool:
+        """
+        Check if the readout of the sequence provides the requested samples
+        @param samples: Requested RX samples
+        @return:        Readout long enough (true/false)
+        """
+        return self.rx_samples >= samples
+
+
+@lru_cache(maxsize=64)
+def analyze(bytestream: bytes, sample_time: float = rxSampleTime) -> SequenceTiming:
+    """
+    Analyze the timing of an assembled program.
+    Instructions other than PR are accounted with one clock cycle each.
+    @param bytestream:  Program as returned by the assembler
+    @param sample_time: Duration of one RX sample in us
+    @return:            Sequence timing
+    """
+    instructions = disassemble(bytestream)
+    words = instructions['word'].tolist()
+    opcodes = instructions['opcode'].tolist()
+    registers = instructions['register'].tolist()
+    addresses = instructions['address'].tolist()
+    constants = instructions['constant'].tolist()
+
+    rx_windows: list = []
+    steps = 0
+    regs: dict = {}
+    rx_start = None
+    rx_last = 0  # Cycles acquired since the last RX FIFO reset
+    pc = 0
+    cycles = 0
+
+    while steps < maxSteps:
+        if pc >= len(words):
+            raise ValueError("Program counter {} beyond the end of the program".format(hex(pc)))
+        opcode = opcodes[pc]
+        steps += 1
+
+        if opcode == PR:
+            output = regs.get(registers[pc], 0)
+            delay = constants[pc]
+            if output & RX_PULSE:
+                if rx_start is not None:
+                    rx_windows.append((rx_start * clockCycle, cycles * clockCycle))
+                    rx_start = None
+                rx_last = 0
+            else:
+                if rx_start is None:
+                    rx_start = cycles
+                rx_last += delay
+            cycles += delay
+            pc += 1
+            continue
+
+        cycles += 1
+        if opcode == J:
+            pc = addresses[pc]
+        elif opcode == JNZ:
+            pc = addresses[pc] if regs.get(registers[pc], 0) != 0 else pc + 1
+        elif opcode == LD64:
+            regs[registers[pc]] = words[addresses[pc]]
+            pc += 1
+        elif opcode == DEC:
+            regs[registers[pc]] = regs.get(registers[pc], 0) - 1
+            pc += 1
+        elif opcode == INC:
+            regs[registers[pc]] = regs.get(registers[pc], 0) + 1
+            pc += 1
+        elif opcode in (NOP, TXOFFSET, GRADOFFSET):
+            pc += 1
+        elif opcode == HALT:
+            break
+        else:
+            raise ValueError("Instruction {} at {} can not be analyzed".format(bin(opcode), hex(pc)))
+    else:
+        raise ValueError("Program does not halt within {} instructions".format(maxSteps))
+
+    if rx_start is not None:
+        rx_windows.append((rx_start * clockCycle, cycles * clockCycle))
+    return SequenceTiming(duration=cycles * clockCycle,
+                          cycles=cycles,
+                          instructions=steps,
+                          rx_windows=tuple(rx_windows),
+                          rx_samples=int(round(rx_last * clockCycle / sample_time)))